@@ -0,0 +1,311 @@
+"""Generation backends.
+
+Every backend exposes the subset of google.generativeai.GenerativeModel that the
+app uses: ``generate_content(prompt, stream=False)`` returning an object with a
+``.text`` attribute, or an iterable of such chunks when streaming.
+"""
+
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+
+import metrics
+from chunking import estimate_tokens
+
+
+class BackendError(Exception):
+    """Raised by a backend when it cannot produce a response"""
+
+
+class UsageMetadata:
+    """Token counts in the shape of Gemini's usage_metadata"""
+
+    def __init__(self, prompt_token_count, candidates_token_count):
+        self.prompt_token_count = prompt_token_count
+        self.candidates_token_count = candidates_token_count
+
+
+class BackendResponse:
+    """Minimal stand-in for a Gemini response or stream chunk"""
+
+    def __init__(self, text, usage_metadata=None):
+        self.text = text
+        self.usage_metadata = usage_metadata
+
+
+class TokenUsage:
+    """Thread-safe running totals of prompt and response tokens
+
+    Totals are also exported as metrics under model_name, unless it is None.
+    """
+
+    def __init__(self, model_name=None):
+        self.model_name = model_name
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.response_tokens = 0
+        self.last = None
+
+    def record(self, usage_metadata):
+        """Add the counts from a response's usage_metadata, if it has any"""
+        if usage_metadata is None:
+            return
+        prompt_tokens = getattr(usage_metadata, "prompt_token_count", 0) or 0
+        response_tokens = getattr(usage_metadata, "candidates_token_count", 0) or 0
+        with self._lock:
+            self.calls += 1
+            self.prompt_tokens += prompt_tokens
+            self.response_tokens += response_tokens
+            self.last = {"prompt_tokens": prompt_tokens, "response_tokens": response_tokens}
+        if self.model_name is not None:
+            metrics.TOKENS.inc(prompt_tokens, model=self.model_name, kind="prompt")
+            metrics.TOKENS.inc(response_tokens, model=self.model_name, kind="response")
+
+    def snapshot(self):
+        """Current totals as a dict"""
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "prompt_tokens": self.prompt_tokens,
+                "response_tokens": self.response_tokens,
+                "last": self.last,
+            }
+
+
+def _estimated_usage(prompt, text):
+    return UsageMetadata(estimate_tokens(prompt), estimate_tokens(text))
+
+
+class GenerationBackend:
+    """Base class for generation backends"""
+
+    name = "base"
+    # Whether this backend's token usage is reported as model usage in metrics
+    exports_usage = True
+
+    def __init__(self, model_name):
+        # Part of the question cache key, so backends never share cached quizzes
+        self.model_name = model_name
+        self.usage = TokenUsage(model_name if self.exports_usage else None)
+
+    def _record_stream(self, chunks):
+        """Pass chunks through, recording the usage reported with the final one"""
+        last = None
+        for chunk in chunks:
+            last = chunk
+            yield chunk
+        if last is not None:
+            self.usage.record(getattr(last, "usage_metadata", None))
+
+    def generate_content(self, prompt, stream=False, **kwargs):
+        raise NotImplementedError
+
+
+class GeminiBackend(GenerationBackend):
+    """Live Gemini API"""
+
+    name = "gemini"
+
+    def __init__(self, model_name, api_key):
+        super().__init__(model_name)
+        import google.generativeai as genai
+
+        genai.configure(api_key=api_key)
+        self._model = genai.GenerativeModel(model_name)
+
+    def generate_content(self, prompt, stream=False, **kwargs):
+        response = self._model.generate_content(prompt, stream=stream, **kwargs)
+        if stream:
+            return self._record_stream(response)
+        self.usage.record(getattr(response, "usage_metadata", None))
+        return response
+
+
+def _chunk_text(text, size, usage_metadata=None):
+    chunks = [BackendResponse(text[i:i + size]) for i in range(0, len(text), size)] or [BackendResponse("")]
+    chunks[-1].usage_metadata = usage_metadata
+    return chunks
+
+
+class StubBackend(GenerationBackend):
+    """Deterministic offline backend producing valid mcqs JSON
+
+    The reply depends only on the prompt, so runs are reproducible. Latency and
+    failures are simulated from a seeded generator.
+    """
+
+    name = "stub"
+
+    def __init__(self, latency=0.0, latency_jitter=0.0, failure_rate=0.0, seed=0, chunk_size=64):
+        super().__init__("stub")
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.failure_rate = failure_rate
+        self.chunk_size = chunk_size
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _simulate(self):
+        with self._lock:
+            delay = max(0.0, self.latency + self._random.uniform(-self.latency_jitter, self.latency_jitter))
+            failed = self._random.random() < self.failure_rate
+        return delay, failed
+
+    def render(self, prompt):
+        """Build the deterministic reply for a prompt"""
+        match = re.search(r"exactly (\d+) multiple choice", prompt)
+        num_questions = int(match.group(1)) if match else 3
+        text_match = re.search(r"Text:(.*?)You are an expert quiz generator", prompt, re.DOTALL)
+        words = re.findall(r"[A-Za-z][\w-]{3,}", text_match.group(1) if text_match else prompt) or ["content"]
+        digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+        # Multi-level prompts get one question list per level instead of "mcqs"
+        levels_match = re.search(r"difficulty levels: ([\w ,-]+)\.", prompt)
+        if levels_match:
+            levels = [level.strip() for level in levels_match.group(1).split(",")]
+            return json.dumps({level: self._questions(num_questions, words, hashlib.sha256(
+                f"{digest}:{level}".encode("utf-8")).hexdigest()) for level in levels}, indent=2)
+        return json.dumps({"mcqs": self._questions(num_questions, words, digest)}, indent=2)
+
+    def _questions(self, num_questions, words, digest):
+        rng = random.Random(digest)
+        mcqs = []
+        for i in range(num_questions):
+            term = words[rng.randrange(len(words))]
+            choices = [words[rng.randrange(len(words))] for _ in range(3)]
+            correct = "abcd"[rng.randrange(4)]
+            distractors = iter(f"{choice} ({digest[i % 60:i % 60 + 4]}-{n})" for n, choice in enumerate(choices))
+            options = {key: term if key == correct else next(distractors) for key in "abcd"}
+            mcqs.append({
+                "mcq": f"Question {i + 1} [{digest[:8]}]: which option best matches '{term}'?",
+                "options": options,
+                "correct": correct,
+                "explanation": f"The text refers to '{term}'.",
+            })
+        return mcqs
+
+    def generate_content(self, prompt, stream=False, **kwargs):
+        delay, failed = self._simulate()
+        text = self.render(prompt)
+        if not stream:
+            time.sleep(delay)
+            if failed:
+                raise BackendError("Simulated backend failure")
+            response = BackendResponse(text, _estimated_usage(prompt, text))
+            self.usage.record(response.usage_metadata)
+            return response
+
+        chunks = _chunk_text(text, self.chunk_size, _estimated_usage(prompt, text))
+
+        def iterate():
+            # Spread the latency over the stream so the first chunk arrives early
+            per_chunk = delay / len(chunks)
+            for index, chunk in enumerate(chunks):
+                time.sleep(per_chunk)
+                if failed and index >= len(chunks) // 2:
+                    raise BackendError("Simulated backend failure")
+                yield chunk
+
+        return self._record_stream(iterate())
+
+
+class ReplayBackend(GenerationBackend):
+    """Serve saved responses from disk, optionally recording them from another backend
+
+    In ``record`` mode every prompt is forwarded to ``inner`` and its reply saved;
+    in ``replay`` mode only saved replies are served.
+    """
+
+    name = "replay"
+    # Replays spend no tokens, and recorded calls are counted by the inner backend
+    exports_usage = False
+
+    def __init__(self, directory, model_name, inner=None, record=False, chunk_size=64):
+        super().__init__(inner.model_name if record and inner else f"replay:{model_name}")
+        if record and inner is None:
+            raise ValueError("Recording requires an inner backend")
+        self.directory = directory
+        self.inner = inner
+        self.record = record
+        self.chunk_size = chunk_size
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, prompt, kwargs):
+        material = json.dumps([prompt, kwargs], sort_keys=True, default=str)
+        return os.path.join(self.directory, hashlib.sha256(material.encode("utf-8")).hexdigest() + ".json")
+
+    def _load(self, path):
+        try:
+            with open(path, encoding="utf-8") as handle:
+                record = json.load(handle)
+        except FileNotFoundError:
+            raise BackendError("No recorded response for this prompt") from None
+        return record["text"], record.get("usage")
+
+    def _save(self, path, prompt, text, usage):
+        temporary = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temporary, "w", encoding="utf-8") as handle:
+            json.dump({"model": self.model_name, "prompt": prompt, "text": text, "usage": usage},
+                      handle, ensure_ascii=False)
+        os.replace(temporary, path)
+
+    def generate_content(self, prompt, stream=False, **kwargs):
+        path = self._path(prompt, kwargs)
+        if self.record and not os.path.exists(path):
+            # Record the complete reply, then replay it in the requested shape
+            response = self.inner.generate_content(prompt, **kwargs)
+            text = response.text
+            recorded = getattr(response, "usage_metadata", None)
+            usage = None
+            if recorded is not None:
+                usage = {
+                    "prompt_token_count": getattr(recorded, "prompt_token_count", 0) or 0,
+                    "candidates_token_count": getattr(recorded, "candidates_token_count", 0) or 0,
+                }
+            self._save(path, prompt, text, usage)
+        else:
+            text, usage = self._load(path)
+
+        usage_metadata = UsageMetadata(**usage) if usage else _estimated_usage(prompt, text)
+        if stream:
+            return self._record_stream(_chunk_text(text, self.chunk_size, usage_metadata))
+        self.usage.record(usage_metadata)
+        return BackendResponse(text, usage_metadata)
+
+
+def create_backend(kind, model_name):
+    """Build a backend by name: gemini, stub, replay or record"""
+    kind = kind.strip().lower()
+
+    if kind == "gemini":
+        api_key = os.getenv("GEMINI_API_KEY")
+        if not api_key:
+            raise ValueError("GEMINI_API_KEY is not set")
+        return GeminiBackend(model_name, api_key)
+
+    if kind == "stub":
+        return StubBackend(
+            latency=float(os.getenv("LEXIFY_STUB_LATENCY", "0")),
+            latency_jitter=float(os.getenv("LEXIFY_STUB_LATENCY_JITTER", "0")),
+            failure_rate=float(os.getenv("LEXIFY_STUB_FAILURE_RATE", "0")),
+            seed=int(os.getenv("LEXIFY_STUB_SEED", "0")),
+        )
+
+    if kind in ("replay", "record"):
+        directory = os.getenv("LEXIFY_REPLAY_DIR", ".lexify_replay")
+        if kind == "replay":
+            return ReplayBackend(directory, model_name)
+        inner = create_backend(os.getenv("LEXIFY_RECORD_BACKEND", "gemini"), model_name)
+        return ReplayBackend(directory, model_name, inner=inner, record=True)
+
+    raise ValueError(f"Unknown generation backend: {kind}")
+
+
+def create_backend_from_env(model_name):
+    """Build the backend selected by LEXIFY_BACKEND"""
+    return create_backend(os.getenv("LEXIFY_BACKEND", "gemini"), model_name)
@@ -0,0 +1,288 @@
+"""Benchmarks for the generate -> parse -> grade pipeline.
+
+Runs against the offline stub backend (or recorded replies with --backend replay)
+so results are reproducible and need no API key.
+
+    python benchmarks/bench_pipeline.py --save benchmarks/baselines/main.json
+    python benchmarks/bench_pipeline.py --compare benchmarks/baselines/main.json
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+TEXT_SIZES = [50, 500, 5000, 50000]
+QUESTION_COUNTS = [3, 5, 10, 15]
+CLASS_SIZES = [30, 1000]
+SESSION_COUNT = 200
+VOCABULARY = (
+    "energy cell membrane protein enzyme reaction carbon oxygen light chlorophyll "
+    "glucose respiration mitochondria nucleus gene evolution species habitat climate "
+    "system network process theory method structure function pressure velocity"
+).split()
+
+
+def make_text(words, seed=0):
+    """Deterministic prose-like text of roughly the given word count"""
+    rng = random.Random(seed)
+    paragraphs = []
+    remaining = words
+    while remaining > 0:
+        sentences = []
+        for _ in range(rng.randint(3, 8)):
+            length = min(remaining, rng.randint(6, 18))
+            if length <= 0:
+                break
+            sentence = " ".join(rng.choice(VOCABULARY) for _ in range(length))
+            sentences.append(sentence.capitalize() + ".")
+            remaining -= length
+        paragraphs.append(" ".join(sentences))
+    return "\n\n".join(paragraphs)
+
+
+def make_responses(stub):
+    """Realistic and adversarial model replies for the parser benchmarks"""
+    realistic = stub.render(f"Text: {make_text(300)}\nYou are an expert quiz generator. Create exactly 10 multiple choice questions")
+    large = stub.render(f"Text: {make_text(300)}\nYou are an expert quiz generator. Create exactly 5000 multiple choice questions")
+    return {
+        "realistic": realistic,
+        "fenced": f"```json\n{realistic}\n```",
+        "noisy": f"Sure! Here is your quiz {{as requested}}:\n\n{realistic}\n\nLet me know if you need {{more}}.",
+        "large": large,
+        "large_noisy": f"Here you go:\n```json\n{large}\n```\nThe {{braces}} above are the quiz.",
+        "large_truncated": f"Partial reply: {large[:-2]}",
+        "unbalanced": "{ " * 20000 + realistic,
+        "garbage": "{\"mcqs\": [" + "{\"mcq\": \"x\", " * 20000,
+        # Every enclosing object contains the key; quadratic if each one were decoded
+        "nested_key": "{" * 50000 + "\"mcqs\"" + "}" * 50000,
+        # Valid JSON nested deeper than the decoder's recursion limit
+        "deep_nesting": "{\"mcqs\": [], \"b\": " * 2000 + "1" + "}" * 2000,
+    }
+
+
+def percentile(sorted_values, fraction):
+    """Linear-interpolated percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    position = (len(sorted_values) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def measure(fn, iterations, warmup):
+    """Time fn and return latency percentiles, throughput and allocation figures"""
+    for _ in range(warmup):
+        fn()
+
+    timings = []
+    gc.collect()
+    started = time.perf_counter()
+    for _ in range(iterations):
+        begin = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - begin)
+    elapsed = time.perf_counter() - started
+    timings.sort()
+
+    # Allocations are measured in a separate pass because tracing slows everything down
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    fn()
+    after = tracemalloc.take_snapshot()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    allocated = [stat for stat in after.compare_to(before, "lineno") if stat.size_diff > 0]
+
+    return {
+        "iterations": iterations,
+        "p50_ms": percentile(timings, 0.50) * 1000,
+        "p95_ms": percentile(timings, 0.95) * 1000,
+        "p99_ms": percentile(timings, 0.99) * 1000,
+        "mean_ms": sum(timings) / len(timings) * 1000,
+        "ops_per_sec": iterations / elapsed if elapsed else 0.0,
+        "alloc_peak_bytes": peak,
+        "alloc_retained_bytes": sum(stat.size_diff for stat in allocated),
+        "alloc_retained_blocks": sum(stat.count_diff for stat in allocated),
+    }
+
+
+def build_cases(generation, app, stub, args):
+    """Yield (name, callable, iterations) for every benchmark in the matrix"""
+    import numpy as np
+    from grading import AnswerKey, grade_submissions
+    from quiz_store import Quiz, QuizStore
+
+    for words in TEXT_SIZES:
+        text = make_text(words, seed=words)
+        for num_questions in QUESTION_COUNTS:
+            counter = iter(range(10 ** 9))
+
+            def generate(text=text, num_questions=num_questions):
+                questions, error = generation.generate_questions(text, "intermediate", num_questions)
+                if error:
+                    raise RuntimeError(error)
+
+            def fetch_cold(text=text, num_questions=num_questions, counter=counter):
+                # A unique suffix forces a cache miss on every call
+                generation.fetch_questions_gemini(f"{text} {next(counter)}", "intermediate", num_questions)
+
+            def fetch_warm(text=text, num_questions=num_questions):
+                generation.fetch_questions_gemini(text, "intermediate", num_questions)
+
+            slow = words >= 50000
+            yield f"generate[words={words},n={num_questions}]", generate, args.iterations // (10 if slow else 1)
+            yield f"fetch_cold[words={words},n={num_questions}]", fetch_cold, args.iterations // (10 if slow else 1)
+            yield f"fetch_warm[words={words},n={num_questions}]", fetch_warm, args.iterations
+
+    for kind, response in make_responses(stub).items():
+        def parse(response=response):
+            generation.validate_and_parse_json(response)
+
+        iterations = args.iterations // 10 if len(response) > 100000 else args.iterations
+        yield f"parse[{kind},bytes={len(response)}]", parse, max(1, iterations)
+
+    rng = random.Random(0)
+    for num_questions in QUESTION_COUNTS + [100]:
+        questions = json.loads(stub.render(
+            f"Text: {make_text(200)}\nYou are an expert quiz generator. Create exactly {num_questions} multiple choice questions"
+        ))["mcqs"]
+        quiz = Quiz(questions)
+        answers = quiz.new_answers()
+        for i, question in enumerate(quiz.questions):
+            answers[i] = rng.randrange(len(question.options))
+
+        def grade(quiz=quiz, answers=answers):
+            correct_count, _ = app.grade_answers(quiz, answers)
+            app.calculate_grade(correct_count, len(quiz))
+
+        yield f"grade[n={num_questions}]", grade, args.iterations * 10
+
+        key = AnswerKey(questions)
+        for students in CLASS_SIZES:
+            responses = np.random.default_rng(students).integers(-1, 4, size=(students, num_questions), dtype=np.int8)
+
+            def grade_class(key=key, responses=responses):
+                grade_submissions(key, responses)
+
+            yield f"grade_class[n={num_questions},students={students}]", grade_class, args.iterations
+
+    # Memory held by many sessions taking the same quiz; compare alloc_retained_bytes
+    payload = stub.render(
+        f"Text: {make_text(200)}\nYou are an expert quiz generator. Create exactly 15 multiple choice questions"
+    )
+    store = QuizStore()
+    sessions = []
+
+    def legacy_sessions():
+        # Before interning: each session held its own decoded copy, answer texts and results
+        sessions.clear()
+        for _ in range(SESSION_COUNT):
+            questions = json.loads(payload)["mcqs"]
+            selected = {i: question["options"]["a"] for i, question in enumerate(questions)}
+            results = [{
+                "question": question["mcq"],
+                "selected": selected[i],
+                "correct": question["options"][question["correct"]],
+                "is_correct": selected[i] == question["options"][question["correct"]],
+                "explanation": question.get("explanation", ""),
+            } for i, question in enumerate(questions)]
+            sessions.append({"questions": questions, "selected_answers": selected, "results": results})
+
+    def interned_sessions():
+        sessions.clear()
+        for _ in range(SESSION_COUNT):
+            quiz = store.intern(json.loads(payload)["mcqs"])
+            sessions.append({"quiz_id": quiz.quiz_id, "answers": quiz.new_answers()})
+
+    yield f"sessions[legacy,n=15,sessions={SESSION_COUNT}]", legacy_sessions, max(1, args.iterations // 10)
+    yield f"sessions[interned,n=15,sessions={SESSION_COUNT}]", interned_sessions, max(1, args.iterations // 10)
+
+
+def compare(results, baseline_path, threshold):
+    """Print the change against a saved baseline and return the regressed benchmarks"""
+    with open(baseline_path, encoding="utf-8") as handle:
+        baseline = json.load(handle)["results"]
+
+    regressions = []
+    print(f"\nComparison with {baseline_path} (threshold {threshold:.0%} on p50):")
+    for name, stats in results.items():
+        previous = baseline.get(name)
+        if not previous or not previous["p50_ms"]:
+            continue
+        change = stats["p50_ms"] / previous["p50_ms"] - 1
+        flag = ""
+        if change > threshold:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        print(f"  {name:<45} {previous['p50_ms']:>10.3f} -> {stats['p50_ms']:>10.3f} ms ({change:+.1%}){flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the LEXIFY generate -> parse -> grade pipeline")
+    parser.add_argument("--iterations", type=int, default=50, help="Timed iterations per benchmark")
+    parser.add_argument("--warmup", type=int, default=2, help="Untimed iterations per benchmark")
+    parser.add_argument("--filter", default="", help="Only run benchmarks whose name contains this text")
+    parser.add_argument("--backend", choices=["stub", "replay"], default="stub", help="Generation backend")
+    parser.add_argument("--stub-latency", type=float, default=0.0, help="Simulated seconds per stub call")
+    parser.add_argument("--save", help="Write results to this JSON baseline file")
+    parser.add_argument("--compare", help="Compare results with this JSON baseline file")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Relative p50 slowdown reported as a regression")
+    args = parser.parse_args()
+
+    # Configure the app before importing it: offline backend, memory-only cache, no bank on disk
+    os.environ["LEXIFY_BACKEND"] = args.backend
+    os.environ["LEXIFY_STUB_LATENCY"] = str(args.stub_latency)
+    os.environ["LEXIFY_CACHE_PATH"] = "off"
+    os.environ["LEXIFY_BANK_PATH"] = "off"
+    # fetch_cold texts differ only by a suffix; near-duplicate serving would make them warm
+    os.environ["LEXIFY_SIMILARITY_THRESHOLD"] = "0"
+
+    import generation
+    import quizapp03 as app
+    from backends import StubBackend
+
+    stub = StubBackend()
+    results = {}
+    for name, fn, iterations in build_cases(generation, app, stub, args):
+        if args.filter not in name:
+            continue
+        stats = measure(fn, max(1, iterations), args.warmup)
+        results[name] = stats
+        print(f"{name:<45} p50 {stats['p50_ms']:>9.3f} ms  p95 {stats['p95_ms']:>9.3f} ms  "
+              f"p99 {stats['p99_ms']:>9.3f} ms  {stats['ops_per_sec']:>10.1f} ops/s  "
+              f"peak {stats['alloc_peak_bytes'] / 1024:>9.1f} KiB", flush=True)
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, "w", encoding="utf-8") as handle:
+            json.dump({
+                "meta": {
+                    "created": datetime.now().isoformat(timespec="seconds"),
+                    "python": platform.python_version(),
+                    "platform": platform.platform(),
+                    "backend": args.backend,
+                    "stub_latency": args.stub_latency,
+                },
+                "results": results,
+            }, handle, indent=2)
+        print(f"\nSaved baseline to {args.save}")
+
+    if args.compare and compare(results, args.compare, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
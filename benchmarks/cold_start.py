@@ -0,0 +1,113 @@
+"""Cold-start report: import cost of the app and time to first paint.
+
+Each measurement runs in a fresh interpreter so nothing is already imported.
+
+    python benchmarks/cold_start.py
+    python benchmarks/cold_start.py --budget-ms 1500 --top 20
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FIRST_PAINT = """
+import json, sys, time
+from streamlit.testing.v1 import AppTest
+started = time.perf_counter()
+at = AppTest.from_file(sys.argv[1], default_timeout=60)
+at.run()
+elapsed = time.perf_counter() - started
+print(json.dumps({
+    "first_paint_ms": elapsed * 1000,
+    "exceptions": [str(e.value) for e in at.exception],
+    "sdk_imported": "google.generativeai" in sys.modules,
+}))
+"""
+
+
+def run_python(args, env):
+    return subprocess.run([sys.executable, *args], cwd=ROOT, env=env, capture_output=True, text=True)
+
+
+def import_times(env):
+    """Parse `python -X importtime` output into (module, self_us, cumulative_us, depth) rows"""
+    result = run_python(["-X", "importtime", "-c", "import quizapp03"], env)
+    if result.returncode:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return rows
+
+
+def first_paint(env):
+    result = run_python(["-c", FIRST_PAINT, os.path.join(ROOT, "quizapp03.py")], env)
+    if result.returncode:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure LEXIFY cold start")
+    parser.add_argument("--backend", default=os.getenv("LEXIFY_BACKEND", "gemini"),
+                        help="LEXIFY_BACKEND for the measured process")
+    parser.add_argument("--top", type=int, default=15, help="Slowest top-level imports to list")
+    parser.add_argument("--budget-ms", type=float, default=0, help="Fail if importing the app takes longer than this")
+    parser.add_argument("--no-paint", action="store_true", help="Skip the first-paint measurement")
+    parser.add_argument("--json", help="Also write the report to this file")
+    args = parser.parse_args()
+
+    env = dict(os.environ, LEXIFY_BACKEND=args.backend)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [ROOT, env.get("PYTHONPATH")]))
+
+    rows = import_times(env)
+    # Children are listed before their parent, so the app's imports are the rows
+    # between the previous top-level import and quizapp03 itself
+    end = next(i for i, row in enumerate(rows) if row[0] == "quizapp03")
+    start = end
+    while start > 0 and rows[start - 1][3] > 0:
+        start -= 1
+    app = rows[end]
+    rows = rows[start:end]
+    print(f"import quizapp03: {app[2] / 1000:.1f} ms ({app[1] / 1000:.1f} ms in the module body)")
+    print("\nSlowest imports made by the app:")
+    direct = sorted((row for row in rows if row[3] == 1), key=lambda row: row[2], reverse=True)
+    for name, _, cumulative_us, _ in direct[:args.top]:
+        print(f"  {name:<40} {cumulative_us / 1000:>9.1f} ms")
+
+    report = {
+        "backend": args.backend,
+        "import_ms": app[2] / 1000,
+        "module_body_ms": app[1] / 1000,
+        "imports_ms": {name: cumulative_us / 1000 for name, _, cumulative_us, _ in direct},
+        "sdk_imported_at_import": any(row[0] == "google.generativeai" for row in rows),
+    }
+    print(f"\nGemini SDK imported by `import quizapp03`: {'yes' if report['sdk_imported_at_import'] else 'no'}")
+
+    if not args.no_paint:
+        paint = first_paint(env)
+        report.update(paint)
+        print(f"First paint (AppTest run in a fresh process): {paint['first_paint_ms']:.1f} ms")
+        print(f"Gemini SDK imported by the first paint: {'yes' if paint['sdk_imported'] else 'no'}")
+        for message in paint["exceptions"]:
+            print(f"  exception: {message}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as handle:
+            json.dump(report, handle, indent=2)
+
+    if args.budget_ms and report["import_ms"] > args.budget_ms:
+        print(f"\nImport time {report['import_ms']:.1f} ms exceeds the {args.budget_ms:g} ms budget")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,414 @@
+"""Concurrent-session load test for the Streamlit app.
+
+Starts the app with the stub backend (or targets a running one with --url) and
+drives many simulated users over Streamlit's websocket protocol, the way a
+browser does: first paint, paste text, generate, poll the job fragment until the
+quiz is ready, answer every question and submit. Answers, job polls and the
+results page rerun only their fragment, as they do in a browser.
+
+    python benchmarks/loadtest.py --concurrency 1,5,10,25
+    python benchmarks/loadtest.py --concurrency 50 --rounds 2 --shared-text --json load.json
+
+Reports reruns per second, per-rerun latency percentiles and the server's memory
+at each concurrency level. Each level runs against the same server process, so
+memory growth across levels shows what sessions leave behind.
+"""
+
+import argparse
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP = os.path.join(ROOT, "quizapp03.py")
+sys.path.insert(0, ROOT)
+
+from bench_pipeline import make_text, percentile  # noqa: E402
+
+# script_finished statuses that end a rerun (FINISHED_EARLY_FOR_RERUN is followed by another run)
+FINISHED_SUCCESSFULLY = 0
+FINISHED_WITH_COMPILE_ERROR = 1
+FINISHED_FRAGMENT_RUN_SUCCESSFULLY = 3
+
+
+def rss_bytes(pid):
+    """Resident set size of a process, or None when it cannot be read"""
+    try:
+        with open(f"/proc/{pid}/status", encoding="ascii") as handle:
+            for line in handle:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        output = subprocess.run(["ps", "-o", "rss=", "-p", str(pid)], capture_output=True, text=True, check=True)
+        return int(output.stdout.strip()) * 1024
+    except (OSError, ValueError, subprocess.CalledProcessError):
+        return None
+
+
+class SessionFailed(Exception):
+    """A simulated session hit an app exception, a missing widget or a timeout"""
+
+
+class AppSession:
+    """One browser-like websocket session: keeps the rendered page and widget values"""
+
+    def __init__(self, url, timeout):
+        self.url = f"{url.replace('http', 'ws', 1)}/_stcore/stream"
+        self.timeout = timeout
+        self._connection = None
+        self._page = {}  # delta path -> (script run id, fragment id, element kind, element)
+        self._values = {}  # widget id -> WidgetState
+        self._run_id = None
+        self._run_fragments = ()
+        self.auto_reruns = {}  # fragment id -> interval in seconds
+
+    def __enter__(self):
+        from websockets.sync.client import connect
+
+        self._connection = connect(self.url, subprotocols=["streamlit"], max_size=None,
+                                   open_timeout=self.timeout).__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._connection.__exit__(*exc_info)
+
+    def elements(self, kind):
+        """Elements of one kind on the current page, in page order"""
+        return [element for path, (_, _, element_kind, element) in sorted(self._page.items())
+                if element_kind == kind]
+
+    def widget(self, kind, label_prefix):
+        return next((element for element in self.elements(kind) if element.label.startswith(label_prefix)), None)
+
+    def fragment_of(self, widget_id):
+        for _, fragment_id, _, element in self._page.values():
+            if getattr(element, "id", None) == widget_id:
+                return fragment_id
+        return ""
+
+    def set_text(self, widget, value):
+        self._state(widget.id).string_value = value
+        return self.rerun(fragment_id=self.fragment_of(widget.id))
+
+    def choose(self, widget, index):
+        """Pick an option of a radio or selectbox by position"""
+        if "raw_value" in widget.DESCRIPTOR.fields_by_name:
+            # Newer Streamlit sends the chosen option's label; older releases send its index
+            self._state(widget.id).string_value = widget.options[index]
+        else:
+            self._state(widget.id).int_value = index
+        return self.rerun(fragment_id=self.fragment_of(widget.id))
+
+    def click(self, widget):
+        return self.rerun(trigger=widget.id, fragment_id=self.fragment_of(widget.id))
+
+    def _state(self, widget_id):
+        from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+        state = self._values[widget_id] = WidgetState(id=widget_id)
+        return state
+
+    def rerun(self, trigger=None, fragment_id="", auto=False):
+        """Send a rerun request and wait for its script run to finish; returns seconds taken"""
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+
+        message = BackMsg()
+        client_state = message.rerun_script
+        client_state.fragment_id = fragment_id
+        client_state.is_auto_rerun = auto
+        for state in self._values.values():
+            client_state.widget_states.widgets.add().CopyFrom(state)
+        if trigger is not None:
+            client_state.widget_states.widgets.add(id=trigger, trigger_value=True)
+
+        started = time.perf_counter()
+        self._connection.send(message.SerializeToString())
+        self._receive_until_finished(started + self.timeout)
+        return time.perf_counter() - started
+
+    def _receive_until_finished(self, deadline):
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+        while True:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                raise SessionFailed("rerun did not finish before the timeout")
+            try:
+                raw = self._connection.recv(timeout=remaining)
+            except TimeoutError:
+                raise SessionFailed("rerun did not finish before the timeout") from None
+            message = ForwardMsg()
+            message.ParseFromString(raw)
+            kind = message.WhichOneof("type")
+            if kind == "new_session":
+                self._run_id = message.new_session.script_run_id
+                self._run_fragments = tuple(message.new_session.fragment_ids_this_run)
+            elif kind == "delta":
+                self._apply_delta(message)
+            elif kind == "auto_rerun":
+                self.auto_reruns[message.auto_rerun.fragment_id] = message.auto_rerun.interval
+            elif kind == "script_finished":
+                status = message.script_finished
+                if status == FINISHED_WITH_COMPILE_ERROR:
+                    raise SessionFailed("app failed to compile")
+                if status in (FINISHED_SUCCESSFULLY, FINISHED_FRAGMENT_RUN_SUCCESSFULLY):
+                    self._drop_stale(fragment_run=status == FINISHED_FRAGMENT_RUN_SUCCESSFULLY)
+                    return
+
+    def _apply_delta(self, message):
+        delta = message.delta
+        path = tuple(message.metadata.delta_path)
+        if delta.WhichOneof("type") == "new_element":
+            element_kind = delta.new_element.WhichOneof("type")
+            element = getattr(delta.new_element, element_kind)
+            if element_kind == "exception":
+                raise SessionFailed(f"app raised {element.type}: {element.message}")
+            self._page[path] = (self._run_id, delta.fragment_id, element_kind, element)
+        elif delta.WhichOneof("type") == "add_block":
+            self._page[path] = (self._run_id, delta.fragment_id, "block", delta.add_block)
+
+    def _drop_stale(self, fragment_run):
+        """Forget elements the finished run did not redraw, as the browser clears them"""
+        for path, (run_id, fragment_id, _, _) in list(self._page.items()):
+            if run_id != self._run_id and (not fragment_run or fragment_id in self._run_fragments):
+                del self._page[path]
+        # Like the browser, forget the values of widgets that are gone
+        on_page = {getattr(element, "id", None) for _, _, _, element in self._page.values()}
+        self._values = {key: state for key, state in self._values.items() if key in on_page}
+        if not fragment_run:
+            # A full run re-sends auto-rerun requests for the fragments still on the page
+            live = {fragment_id for _, fragment_id, _, _ in self._page.values()}
+            self.auto_reruns = {key: value for key, value in self.auto_reruns.items() if key in live}
+
+
+class Recorder:
+    """Per-rerun latencies and session outcomes for one concurrency level"""
+
+    def __init__(self):
+        self.reruns = []  # (action, seconds)
+        self.time_to_quiz = []
+        self.completed = 0
+        self.errors = []
+        self._lock = threading.Lock()
+
+    def record(self, action, seconds):
+        with self._lock:
+            self.reruns.append((action, seconds))
+
+    def quiz_ready(self, seconds):
+        with self._lock:
+            self.time_to_quiz.append(seconds)
+
+    def session_done(self, error=None):
+        with self._lock:
+            if error is None:
+                self.completed += 1
+            else:
+                self.errors.append(error)
+
+
+def run_session(index, args, recorder):
+    """One simulated user: generate, answer and submit args.rounds quizzes"""
+    rng = random.Random(index)
+    text = make_text(args.words, seed=0 if args.shared_text else index + 1)
+    with AppSession(args.url, args.timeout) as session:
+        recorder.record("paint", session.rerun())
+        text_area = next(iter(session.elements("text_area")), None)
+        if text_area is None:
+            raise SessionFailed("no text area on the first page")
+        recorder.record("input", session.set_text(text_area, text))
+
+        for _ in range(args.rounds):
+            generate = session.widget("button", "Generate")
+            if generate is None:
+                raise SessionFailed("no generate button")
+            clicked = time.perf_counter()
+            recorder.record("generate", session.click(generate))
+
+            while not session.elements("radio"):
+                if not session.auto_reruns:
+                    raise SessionFailed("no quiz and no generation job on the page")
+                if time.perf_counter() - clicked > args.timeout:
+                    raise SessionFailed("quiz not ready before the timeout")
+                fragment_id, interval = next(iter(session.auto_reruns.items()))
+                time.sleep(args.poll if args.poll is not None else interval)
+                recorder.record("poll", session.rerun(fragment_id=fragment_id, auto=True))
+            recorder.quiz_ready(time.perf_counter() - clicked)
+
+            for radio in session.elements("radio"):
+                recorder.record("answer", session.choose(radio, rng.randrange(len(radio.options))))
+                time.sleep(args.think)
+
+            submit = session.widget("button", "Submit")
+            if submit is None or submit.disabled:
+                raise SessionFailed("submit button unavailable")
+            recorder.record("submit", session.click(submit))
+            if not any("metric-card" in markdown.body for markdown in session.elements("markdown")):
+                raise SessionFailed("results were not rendered")
+
+
+def run_level(concurrency, args, server_pid):
+    """Run concurrency sessions at once and summarize their reruns"""
+    recorder = Recorder()
+
+    def worker(index):
+        try:
+            run_session(index, args, recorder)
+        except Exception as e:
+            recorder.session_done(f"{type(e).__name__}: {e}")
+        else:
+            recorder.session_done()
+
+    def server_rss():
+        return rss_bytes(server_pid) if server_pid else None
+
+    rss_before = server_rss()
+    peak_rss = [rss_before]
+    stop = threading.Event()
+
+    def sample_memory():
+        while not stop.wait(0.1):
+            current = server_rss()
+            if current is not None:
+                peak_rss[0] = max(peak_rss[0] or 0, current)
+
+    sampler = threading.Thread(target=sample_memory, daemon=True)
+    sampler.start()
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(args.session_offset + i,)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+    stop.set()
+    sampler.join()
+    args.session_offset += concurrency
+    rss_after = server_rss()
+
+    latencies = sorted(seconds for _, seconds in recorder.reruns)
+    by_action = {}
+    for action, seconds in recorder.reruns:
+        by_action.setdefault(action, []).append(seconds)
+    time_to_quiz = sorted(recorder.time_to_quiz)
+    return {
+        "concurrency": concurrency,
+        "sessions_completed": recorder.completed,
+        "errors": recorder.errors,
+        "wall_s": wall,
+        "reruns": len(latencies),
+        "reruns_per_sec": len(latencies) / wall if wall else 0.0,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "p95_ms_by_action": {action: percentile(sorted(values), 0.95) * 1000 for action, values in by_action.items()},
+        "time_to_quiz_p50_s": percentile(time_to_quiz, 0.50),
+        "time_to_quiz_p95_s": percentile(time_to_quiz, 0.95),
+        "server_rss_mb": megabytes(rss_after),
+        "server_peak_rss_mb": megabytes(peak_rss[0]),
+        "server_rss_growth_mb": megabytes(rss_after - rss_before) if None not in (rss_after, rss_before) else None,
+    }
+
+
+def megabytes(value):
+    return value / 2 ** 20 if value is not None else None
+
+
+def free_port():
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+def start_server(args):
+    """Run the app under `streamlit run` with the stub backend; returns (process, url)"""
+    env = dict(os.environ)
+    env["LEXIFY_BACKEND"] = "stub"
+    env["LEXIFY_STUB_LATENCY"] = str(args.stub_latency)
+    env.setdefault("LEXIFY_CACHE_PATH", "off")
+    env.setdefault("LEXIFY_BANK_PATH", "off")
+    port = free_port()
+    command = [sys.executable, "-m", "streamlit", "run", APP, "--server.headless", "true",
+               "--server.port", str(port), "--server.fileWatcherType", "none",
+               "--global.developmentMode", "false", "--browser.gatherUsageStats", "false"]
+    process = subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"streamlit exited early:\n{process.stderr.read().decode(errors='replace')}")
+        try:
+            with urllib.request.urlopen(f"{url}/_stcore/health", timeout=1) as response:
+                if response.status == 200:
+                    return process, url
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise SystemExit("streamlit did not become healthy within 60 seconds")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the LEXIFY app with concurrent simulated sessions")
+    parser.add_argument("--concurrency", default="1,5,10,25",
+                        help="Comma-separated numbers of simultaneous sessions, run in turn")
+    parser.add_argument("--rounds", type=int, default=1, help="Quizzes each session generates and submits")
+    parser.add_argument("--words", type=int, default=300, help="Words of source text per session")
+    parser.add_argument("--shared-text", action="store_true",
+                        help="Give every session the same text (exercises the cache and request coalescing)")
+    parser.add_argument("--stub-latency", type=float, default=0.5, help="Simulated seconds per model call")
+    parser.add_argument("--think", type=float, default=0.0, help="Seconds a user pauses after each answer")
+    parser.add_argument("--poll", type=float,
+                        help="Seconds between job polls (default: the app's fragment interval)")
+    parser.add_argument("--timeout", type=float, default=120, help="Seconds before a session is counted as failed")
+    parser.add_argument("--url", help="Drive an already running app instead of starting one "
+                                      "(its backend is left as configured and memory is not reported)")
+    parser.add_argument("--json", help="Also write the report to this file")
+    args = parser.parse_args()
+    args.session_offset = 0
+
+    process = None
+    if args.url:
+        args.url = args.url.rstrip("/")
+    else:
+        process, args.url = start_server(args)
+    server_pid = process.pid if process else None
+
+    levels = [int(level) for level in args.concurrency.split(",") if level.strip()]
+    print(f"{'sessions':>8} {'done':>5} {'errors':>6} {'reruns/s':>9} {'p50 ms':>8} {'p95 ms':>8} "
+          f"{'p99 ms':>8} {'quiz p95 s':>10} {'RSS MB':>8} {'peak MB':>8}", flush=True)
+    report = []
+    try:
+        for concurrency in levels:
+            result = run_level(concurrency, args, server_pid)
+            report.append(result)
+            rss = "-" if result["server_rss_mb"] is None else f"{result['server_rss_mb']:.1f}"
+            peak = "-" if result["server_peak_rss_mb"] is None else f"{result['server_peak_rss_mb']:.1f}"
+            print(f"{concurrency:>8} {result['sessions_completed']:>5} {len(result['errors']):>6} "
+                  f"{result['reruns_per_sec']:>9.1f} {result['p50_ms']:>8.1f} {result['p95_ms']:>8.1f} "
+                  f"{result['p99_ms']:>8.1f} {result['time_to_quiz_p95_s']:>10.2f} {rss:>8} {peak:>8}", flush=True)
+            for error in sorted(set(result["errors"]))[:3]:
+                print(f"         {error}")
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=10)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as handle:
+            json.dump({"args": {key: value for key, value in vars(args).items() if key != "session_offset"},
+                       "levels": report}, handle, indent=2)
+
+    if any(result["errors"] for result in report):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
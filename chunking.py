@@ -0,0 +1,78 @@
+import math
+import re
+
+# Rough average for English prose with Gemini's tokenizer
+CHARS_PER_TOKEN = 4
+
+_SECTION_BREAK = re.compile(r"\n\s*\n|\n(?=#{1,6}\s)")
+_SENTENCE_BREAK = re.compile(r"(?<=[.!?])\s+")
+
+
+def estimate_tokens(text):
+    """Cheap token estimate used for budgeting prompts"""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def _split_oversized(paragraph, max_tokens):
+    """Break a paragraph that exceeds the budget on sentence, then word boundaries"""
+    pieces = []
+    for sentence in _SENTENCE_BREAK.split(paragraph):
+        if estimate_tokens(sentence) <= max_tokens:
+            pieces.append(sentence)
+            continue
+        max_chars = max_tokens * CHARS_PER_TOKEN
+        words = []
+        for word in sentence.split():
+            words.extend(word[i:i + max_chars] for i in range(0, len(word), max_chars))
+        current = []
+        current_chars = 0
+        for word in words:
+            if current and current_chars + 1 + len(word) > max_chars:
+                pieces.append(" ".join(current))
+                current = []
+                current_chars = 0
+            current_chars += len(word) + (1 if current else 0)
+            current.append(word)
+        if current:
+            pieces.append(" ".join(current))
+    return pieces
+
+
+def split_into_chunks(text, max_tokens):
+    """Split text on section and paragraph boundaries into chunks of at most max_tokens"""
+    paragraphs = [part.strip() for part in _SECTION_BREAK.split(text) if part.strip()]
+
+    units = []
+    for paragraph in paragraphs:
+        if estimate_tokens(paragraph) > max_tokens:
+            units.extend(_split_oversized(paragraph, max_tokens))
+        else:
+            units.append(paragraph)
+
+    chunks = []
+    current = []
+    current_tokens = 0
+    for unit in units:
+        unit_tokens = estimate_tokens(unit) + 1
+        if current and current_tokens + unit_tokens > max_tokens:
+            chunks.append("\n\n".join(current))
+            current = []
+            current_tokens = 0
+        current.append(unit)
+        current_tokens += unit_tokens
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+
+def allocate_questions(chunk_count, num_questions):
+    """Distribute num_questions across chunks as evenly as possible
+
+    When there are more chunks than questions, the chosen chunks are spread over
+    the whole document rather than taken from the start.
+    """
+    base, extra = divmod(num_questions, chunk_count)
+    quotas = [base] * chunk_count
+    for position in range(extra):
+        quotas[int((position + 0.5) * chunk_count / extra)] += 1
+    return quotas
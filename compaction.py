@@ -0,0 +1,168 @@
+"""Shrink source text before it is sent to the model.
+
+Pasted material often repeats page headers, navigation and whole paragraphs.
+compact_text normalizes whitespace, drops repeated paragraphs and short lines that
+recur at paragraph edges, and, when the text is still over a token budget, keeps the sentences with
+the highest TF-IDF salience in their original order.
+"""
+
+import math
+import re
+from collections import Counter
+
+from chunking import CHARS_PER_TOKEN, estimate_tokens
+
+# Lines this short that start or end a paragraph this many times are boilerplate
+# (page headers and footers, menus); shorter repeats are usually real headings
+BOILERPLATE_MAX_WORDS = 12
+BOILERPLATE_MIN_REPEATS = 3
+
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+_SENTENCE_BREAK = re.compile(r"(?<=[.!?])\s+")
+_LIST_ITEM = re.compile(r"(?:[-*+\u2022]|\d+[.)])\s")
+_TERM = re.compile(r"[^\W\d_]{3,}")
+_STOPWORDS = frozenset("""
+the and for are but not you all any can had her was one our out has him his how its may new now
+old see two way who did get let put say she too use that with this from they will would there
+their what about which when make like time just know take into year your some could them than
+then also only come over such most other were been have more these those each where while very
+""".split())
+
+
+def normalize_whitespace(text):
+    """Collapse runs of spaces within lines and of blank lines between paragraphs"""
+    lines = [" ".join(line.split()) for line in text.splitlines()]
+    return re.sub(r"\n{3,}", "\n\n", "\n".join(lines)).strip()
+
+
+def _fingerprint(text):
+    return " ".join(text.lower().split())
+
+
+def _is_short(fingerprint):
+    return len(fingerprint.split()) <= BOILERPLATE_MAX_WORDS
+
+
+def _edge_lines(lines):
+    """Indexes of the first and last line of a paragraph"""
+    return {0, len(lines) - 1}
+
+
+def deduplicate(text):
+    """Drop repeated paragraphs, and boilerplate lines after their first occurrence
+
+    Only paragraphs longer than a boilerplate line are dropped as repeats. A short
+    line is boilerplate when it starts or ends a paragraph (or is one) at least
+    BOILERPLATE_MIN_REPEATS times and is not a list item, so headings and bullets
+    that merely recur ("Advantages:", "- Easy to use") are kept.
+
+    Returns (text, number of paragraphs dropped, number of lines dropped).
+    """
+    seen_paragraphs = set()
+    paragraphs = []
+    dropped_paragraphs = 0
+    for paragraph in _PARAGRAPH_BREAK.split(text):
+        fingerprint = _fingerprint(paragraph)
+        if not fingerprint:
+            continue
+        if not _is_short(fingerprint):
+            if fingerprint in seen_paragraphs:
+                dropped_paragraphs += 1
+                continue
+            seen_paragraphs.add(fingerprint)
+        paragraphs.append(paragraph.split("\n"))
+
+    edge_counts = Counter()
+    for lines in paragraphs:
+        for index in _edge_lines(lines):
+            fingerprint = _fingerprint(lines[index])
+            if fingerprint and _is_short(fingerprint) and not _LIST_ITEM.match(fingerprint):
+                edge_counts[fingerprint] += 1
+    boilerplate = {fingerprint for fingerprint, count in edge_counts.items() if count >= BOILERPLATE_MIN_REPEATS}
+
+    seen_lines = set()
+    kept_paragraphs = []
+    dropped_lines = 0
+    for lines in paragraphs:
+        edges = _edge_lines(lines)
+        kept = []
+        for index, line in enumerate(lines):
+            fingerprint = _fingerprint(line)
+            if index in edges and fingerprint in boilerplate:
+                if fingerprint in seen_lines:
+                    dropped_lines += 1
+                    continue
+                seen_lines.add(fingerprint)
+            kept.append(line)
+        if kept:
+            kept_paragraphs.append("\n".join(kept))
+    return "\n\n".join(kept_paragraphs), dropped_paragraphs, dropped_lines
+
+
+def _terms(sentence):
+    return [term for term in _TERM.findall(sentence.lower()) if term not in _STOPWORDS]
+
+
+def select_salient(text, token_budget):
+    """Keep the most informative sentences that fit in token_budget, in original order
+
+    Sentences are scored by the TF-IDF weight of their terms (sentences as documents),
+    divided by the square root of their length so long sentences are not favoured
+    just for being long. Returns (text, number of sentences dropped).
+    """
+    paragraphs = [_SENTENCE_BREAK.split(paragraph) for paragraph in _PARAGRAPH_BREAK.split(text)]
+    sentences = [(p, s, sentence) for p, paragraph in enumerate(paragraphs)
+                 for s, sentence in enumerate(paragraph) if sentence.strip()]
+    term_lists = [_terms(sentence) for _, _, sentence in sentences]
+    document_frequency = Counter(term for terms in term_lists for term in set(terms))
+    count = len(sentences)
+
+    scored = []
+    for index, terms in enumerate(term_lists):
+        if not terms:
+            scored.append((0.0, index))
+            continue
+        frequencies = Counter(terms)
+        weight = sum(tf * math.log(1 + count / document_frequency[term]) for term, tf in frequencies.items())
+        scored.append((weight / math.sqrt(len(terms)), index))
+
+    keep = set()
+    used = 0
+    for _, index in sorted(scored, key=lambda item: (-item[0], item[1])):
+        cost = estimate_tokens(sentences[index][2]) + 1
+        if used + cost <= token_budget:
+            keep.add(index)
+            used += cost
+
+    if not keep:
+        # Every sentence is over budget on its own; fall back to a plain cut
+        return text[:token_budget * CHARS_PER_TOKEN], count
+
+    kept_paragraphs = {}
+    for index in sorted(keep):
+        p, _, sentence = sentences[index]
+        kept_paragraphs.setdefault(p, []).append(sentence)
+    compacted = "\n\n".join(" ".join(kept) for _, kept in sorted(kept_paragraphs.items()))
+    return compacted, count - len(keep)
+
+
+def compact_text(text, token_budget=0):
+    """Normalize, deduplicate and (above token_budget, when positive) trim text for prompting
+
+    Returns (compacted text, report) where report counts input and output tokens,
+    tokens saved and what was dropped.
+    """
+    input_tokens = estimate_tokens(text)
+    compacted, dropped_paragraphs, dropped_lines = deduplicate(normalize_whitespace(text))
+    dropped_sentences = 0
+    if token_budget > 0 and estimate_tokens(compacted) > token_budget:
+        compacted, dropped_sentences = select_salient(compacted, token_budget)
+    output_tokens = estimate_tokens(compacted)
+    return compacted, {
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens,
+        "tokens_saved": input_tokens - output_tokens,
+        "duplicate_paragraphs": dropped_paragraphs,
+        "boilerplate_lines": dropped_lines,
+        "dropped_sentences": dropped_sentences,
+    }
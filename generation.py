@@ -0,0 +1,735 @@
+"""Quiz generation pipeline shared by the Streamlit app, the HTTP API and the batch CLI.
+
+Builds prompts, plans and merges model requests, and fetches quizzes through the
+question cache, near-duplicate index, question bank and single-flight coordinator.
+Nothing here imports Streamlit, so headless callers run it outside a script context.
+"""
+
+import functools
+import json
+import os
+import queue
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dotenv import load_dotenv
+import metrics
+import profiling
+from backends import create_backend_from_env
+from chunking import allocate_questions, estimate_tokens, split_into_chunks
+from compaction import compact_text
+from question_bank import content_hash, create_bank_from_env, derive_topic
+from question_cache import create_cache_from_env, make_cache_key
+from quiz_parsing import MCQStreamParser, extract_mcqs, validate_questions
+from quiz_store import QuizStore
+from resilience import ReplyParseError, create_policy_from_env
+from similarity import create_similarity_index_from_env, similarity_scope
+from singleflight import create_single_flight_from_env
+
+load_dotenv()
+
+MODEL_NAME = os.getenv("LEXIFY_MODEL", "gemini-1.5-flash")
+# Use Gemini's native JSON mode with a response schema instead of an inline JSON template
+STRUCTURED_OUTPUT = os.getenv("LEXIFY_STRUCTURED_OUTPUT", "1") != "0"
+# Normalize whitespace and drop repeated paragraphs and boilerplate before prompting (0 disables)
+COMPACTION_ENABLED = os.getenv("LEXIFY_COMPACTION", "1") != "0"
+# Bump whenever PROMPT_TEMPLATE changes so stale cached quizzes are not served; compaction
+# changes the prompted text, so quizzes with and without it are cached separately
+PROMPT_VERSION = ("1-structured" if STRUCTURED_OUTPUT else "1") + ("-compact" if COMPACTION_ENABLED else "")
+# Quizzes larger than one batch are split into concurrent sub-requests (0 disables)
+FANOUT_BATCH_SIZE = int(os.getenv("LEXIFY_FANOUT_BATCH_SIZE", "5"))
+FANOUT_MAX_WORKERS = int(os.getenv("LEXIFY_FANOUT_MAX_WORKERS", "4"))
+# Longer inputs are split into chunks of this many tokens and generated map-reduce style (0 disables)
+CHUNK_TOKEN_BUDGET = int(os.getenv("LEXIFY_CHUNK_TOKEN_BUDGET", "6000"))
+# Extra candidates requested per chunk so duplicates can be replaced without another call
+CHUNK_SPARE_QUESTIONS = int(os.getenv("LEXIFY_CHUNK_SPARE_QUESTIONS", "1"))
+# Assemble quizzes from previously generated questions when enough match (0 disables)
+BANK_SERVE_ENABLED = os.getenv("LEXIFY_BANK_SERVE", "1") != "0"
+# Near-identical inputs of at least this many words reuse each other's quizzes
+SIMILARITY_MIN_WORDS = int(os.getenv("LEXIFY_SIMILARITY_MIN_WORDS", "50"))
+# Above this many tokens, keep only the most informative sentences (0 disables)
+COMPACT_TOKEN_BUDGET = int(os.getenv("LEXIFY_COMPACT_TOKEN_BUDGET", "0"))
+# Generate every complexity level in the same requests, so switching level is a cache hit
+MULTI_LEVEL_ENABLED = os.getenv("LEXIFY_MULTI_LEVEL", "0") == "1"
+QUIZ_LEVELS = ["beginner", "intermediate", "advanced"]
+
+def validate_and_parse_json(response_text):
+    """Extract the quiz from a model response, keeping only well-formed questions"""
+    questions = extract_mcqs(response_text)
+    if questions:
+        return {"mcqs": questions}
+    return None
+
+# Schema for one quiz; Gemini enforces it when STRUCTURED_OUTPUT is on
+QUESTION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "mcq": {"type": "string"},
+        "options": {
+            "type": "object",
+            "properties": {key: {"type": "string"} for key in "abcd"},
+            "required": list("abcd"),
+        },
+        "correct": {"type": "string", "format": "enum", "enum": list("abcd")},
+        "explanation": {"type": "string"},
+    },
+    "required": ["mcq", "options", "correct", "explanation"],
+}
+RESPONSE_SCHEMA = {
+    "type": "object",
+    "properties": {"mcqs": {"type": "array", "items": QUESTION_SCHEMA}},
+    "required": ["mcqs"],
+}
+
+def multi_level_schema(levels):
+    """Schema for one reply holding a question list per level"""
+    return {
+        "type": "object",
+        "properties": {level: {"type": "array", "items": QUESTION_SCHEMA} for level in levels},
+        "required": list(levels),
+    }
+
+def generation_options(levels=None):
+    """Keyword arguments for generate_content in the configured output mode"""
+    if not STRUCTURED_OUTPUT:
+        return {}
+    schema = multi_level_schema(levels) if levels else RESPONSE_SCHEMA
+    return {"generation_config": {"response_mime_type": "application/json", "response_schema": schema}}
+
+def shared_resource(factory):
+    """Build factory()'s resource once per process on first use, like st.cache_resource
+    
+    A factory that raises is retried on the next call.
+    """
+    lock = threading.Lock()
+    resource = []
+    
+    @functools.wraps(factory)
+    def get():
+        with lock:
+            if not resource:
+                resource.append(factory())
+        return resource[0]
+    return get
+
+@shared_resource
+def get_model():
+    """Generation backend (LEXIFY_BACKEND: gemini, stub, replay or record), created on first use
+    
+    Creating it imports and configures the Gemini SDK, so it is deferred until a quiz
+    is actually generated and then shared by all sessions.
+    """
+    return create_backend_from_env(MODEL_NAME)
+
+def load_model():
+    """The shared backend, or None when it cannot be created"""
+    try:
+        return get_model()
+    except Exception:
+        return None
+
+@shared_resource
+def get_question_cache():
+    """Shared question cache, created once per process"""
+    return create_cache_from_env()
+
+@shared_resource
+def get_similarity_index():
+    """Shared near-duplicate index, stored alongside the question cache (None when disabled)"""
+    cache = get_question_cache()
+    return create_similarity_index_from_env(cache.path, cache.ttl_seconds)
+
+@shared_resource
+def get_single_flight():
+    """Shared coordinator that lets concurrent identical requests wait on one generation"""
+    return create_single_flight_from_env(get_question_cache().path)
+
+@shared_resource
+def get_resilience_policy():
+    """Shared deadline, retry and hedging policy for model calls"""
+    return create_policy_from_env()
+
+@shared_resource
+def get_quiz_store():
+    """Quizzes shared by every session; sessions keep only a quiz ID and their answers"""
+    return QuizStore()
+
+@shared_resource
+def get_question_bank():
+    """Shared question bank, created once per process (None when disabled)"""
+    return create_bank_from_env()
+def build_prompt(text_content, quiz_level, num_questions, extra_requirements="", levels=None):
+    """Build the generation prompt for the given content and settings
+    
+    With levels, one reply holds num_questions questions for each level, keyed by level.
+    """
+    if levels:
+        task = (f"Create exactly {num_questions} multiple choice questions for each of these "
+                f"difficulty levels: {', '.join(levels)}.")
+        difficulty = (f"- Difficulty level: the questions under each level key must match that level; "
+                      f"write the {levels[0]} questions first")
+    else:
+        task = f"Create exactly {num_questions} multiple choice questions based on the provided text."
+        difficulty = f"- Difficulty level: {quiz_level}"
+    
+    if STRUCTURED_OUTPUT:
+        # The response schema is sent separately, so the prompt only needs the task
+        return f"""Text: {text_content}
+
+You are an expert quiz generator. {task}
+
+Requirements:
+{difficulty}
+- Questions must be directly answerable from the text
+- No repeated questions
+- Each question should have 4 distinct options (a, b, c, d); "correct" is the letter of the right one
+- Include brief explanations for correct answers
+- Ensure variety in question types (factual, conceptual, analytical)
+{extra_requirements.strip()}
+"""
+    
+    # Dynamic response template based on number of questions
+    questions_template = []
+    for i in range(1, num_questions + 1):
+        questions_template.append({
+            "mcq": f"multiple choice question{i}",
+            "options": {
+                "a": "choice here1",
+                "b": "choice here2", 
+                "c": "choice here3",
+                "d": "choice here4"
+            },
+            "correct": "correct choice option in the form of a, b, c or d",
+            "explanation": "brief explanation of why this is the correct answer"
+        })
+    
+    if levels:
+        RESPONSE_JSON = {level: questions_template for level in levels}
+    else:
+        RESPONSE_JSON = {"mcqs": questions_template}
+    
+    PROMPT_TEMPLATE = f"""
+    Text: {text_content}
+
+    You are an expert quiz generator. {task}
+
+    Requirements:
+    {difficulty}
+    - Questions must be directly answerable from the text
+    - No repeated questions
+    - Each question should have 4 distinct options
+    - Include brief explanations for correct answers
+    - Ensure variety in question types (factual, conceptual, analytical)
+    {extra_requirements}
+
+    Response format (JSON only, no additional text):
+    {json.dumps(RESPONSE_JSON, indent=2)}
+
+    Important: Return ONLY valid JSON, no markdown formatting or additional text.
+    """
+    return PROMPT_TEMPLATE
+
+def prepare_content(text_content):
+    """Expand single words and short phrases into a topic brief the model can quiz on"""
+    word_count = len(text_content.split())
+    if word_count == 1:
+        # Single word - enhance with context
+        return f"""
+                    Topic: {text_content.strip()}
+                    
+                    This assessment will cover comprehensive knowledge about {text_content.strip()}, including:
+                    - Definition and basic concepts
+                    - Key characteristics and properties  
+                    - Applications and real-world usage
+                    - Related terminology and concepts
+                    - Important facts and details
+                    
+                    Please generate questions that test understanding of this topic from multiple perspectives.
+                    """
+    elif word_count < 20:
+        # Short phrase - add context
+        return f"""
+                    Subject: {text_content.strip()}
+                    
+                    This assessment focuses on {text_content.strip()} and will test knowledge including:
+                    - Core concepts and definitions
+                    - Practical applications
+                    - Key principles and theories
+                    - Important details and facts
+                    - Related topics and connections
+                    
+                    Generate comprehensive questions covering various aspects of this subject.
+                    """
+    # Use original content if sufficient
+    return text_content
+
+def parse_level_set(response_text, levels):
+    """{level: questions} from a multi-level reply; levels missing from it map to None"""
+    return {level: extract_mcqs(response_text, key=level) for level in levels}
+
+@contextmanager
+def observe_model_call(model, mode):
+    """Record the duration and any error of one generate_content call in metrics"""
+    with metrics.MODEL_CALL_SECONDS.time(model=model.model_name, mode=mode):
+        try:
+            yield
+        except Exception as e:
+            metrics.MODEL_CALL_ERRORS.inc(model=model.model_name, mode=mode, error=type(e).__name__)
+            raise
+
+def request_questions(prompt, levels=None):
+    """Send one prompt to Gemini and parse the questions from the reply
+    
+    Timeouts, transient API errors and unparsable replies are retried by the resilience policy.
+    For a multi-level prompt the result is {level: questions}; only levels[0] must parse.
+    """
+    # Attempts run on the policy's worker threads, so the trace is passed explicitly
+    trace = profiling.current_trace()
+    model = get_model()
+    def attempt():
+        with profiling.phase("model", trace), observe_model_call(model, "call"):
+            response = model.generate_content(prompt, **generation_options(levels))
+        with profiling.phase("parse", trace):
+            if levels:
+                level_set = parse_level_set(response.text, levels)
+                parsed = level_set if level_set[levels[0]] else None
+            else:
+                parsed_data = validate_and_parse_json(response.text)
+                parsed = parsed_data["mcqs"] if parsed_data and "mcqs" in parsed_data else None
+        if parsed is None:
+            metrics.PARSE_FAILURES.inc(model=model.model_name)
+            raise ReplyParseError("Failed to parse quiz questions from response")
+        return parsed
+    
+    try:
+        return get_resilience_policy().call(attempt), None
+    except ReplyParseError as e:
+        return None, str(e)
+    except Exception as e:
+        return None, f"Error generating questions: {str(e)}"
+
+def question_fingerprint(question):
+    """Normalized question text used to detect duplicates across batches"""
+    text = str(question.get("mcq", "")) if isinstance(question, dict) else ""
+    return " ".join(re.sub(r"[^\w\s]", " ", text.lower()).split())
+
+def merge_unique_questions(batches, seen=None):
+    """Concatenate question batches, dropping repeated questions"""
+    seen = set() if seen is None else seen
+    merged = []
+    for batch in batches:
+        for question in batch or []:
+            fingerprint = question_fingerprint(question)
+            if not fingerprint or fingerprint in seen:
+                continue
+            seen.add(fingerprint)
+            merged.append(question)
+    return merged
+
+def split_batches(num_questions, batch_size):
+    """Split a question count into near-equal batch sizes, e.g. 15 -> [5, 5, 5]"""
+    batch_count = -(-num_questions // batch_size)
+    base, extra = divmod(num_questions, batch_count)
+    return [base + (1 if i < extra else 0) for i in range(batch_count)]
+
+def batch_note(batch_index, batch_count, avoid_questions=()):
+    """Extra prompt requirement steering each sub-request to different material"""
+    note = (f"- This is part {batch_index} of {batch_count} of a larger quiz: focus on a distinct "
+            f"section or aspect of the text so the parts do not overlap")
+    if avoid_questions:
+        listed = "; ".join(question["mcq"] for question in avoid_questions)
+        note += f"\n- Do not repeat any of these existing questions: {listed}"
+    return note
+
+def chunk_note(chunk_index, chunk_count):
+    """Extra prompt requirement for one section of a long document"""
+    return (f"- The text is section {chunk_index} of {chunk_count} of a longer document: "
+            f"only ask about material in this section")
+
+def variant_note(variant):
+    """Extra prompt requirement asking for an alternate version of the same quiz"""
+    if not variant:
+        return ""
+    return (f"- This is alternate version {variant + 1} of this quiz: ask about different facts "
+            f"and details than a first version would, and do not reuse its wording")
+
+def join_notes(*notes):
+    """Combine extra prompt requirements, skipping empty ones"""
+    return "\n".join(note for note in notes if note)
+
+def plan_requests(text_content, quiz_level, num_questions, variant=0, levels=None):
+    """Split one quiz into sub-requests of (source text, prompt, question quota)
+    
+    With levels, every prompt asks for its quota of questions at each level.
+    """
+    alternate = variant_note(variant)
+    if CHUNK_TOKEN_BUDGET > 0 and estimate_tokens(text_content) > CHUNK_TOKEN_BUDGET:
+        chunks = split_into_chunks(text_content, CHUNK_TOKEN_BUDGET)
+        quotas = allocate_questions(len(chunks), num_questions)
+        plan = []
+        for i, (chunk, quota) in enumerate(zip(chunks, quotas)):
+            if quota:
+                prompt = build_prompt(chunk, quiz_level, quota + CHUNK_SPARE_QUESTIONS,
+                                      join_notes(chunk_note(i + 1, len(chunks)), alternate), levels)
+                plan.append((chunk, prompt, quota))
+        return plan
+    
+    if FANOUT_BATCH_SIZE > 0 and num_questions > FANOUT_BATCH_SIZE:
+        sizes = split_batches(num_questions, FANOUT_BATCH_SIZE)
+        return [
+            (text_content, build_prompt(text_content, quiz_level, size,
+                                         join_notes(batch_note(i + 1, len(sizes)), alternate), levels), size)
+            for i, size in enumerate(sizes)
+        ]
+    
+    return [(text_content, build_prompt(text_content, quiz_level, num_questions, alternate, levels), num_questions)]
+
+class QuotaMerger:
+    """Merge sub-request results into one quiz, keeping each sub-request to its quota
+    
+    Questions beyond a sub-request's quota are kept as spares and only used when
+    other sub-requests fail or return duplicates, so coverage stays balanced.
+    """
+    
+    def __init__(self, plan, num_questions, on_question=None):
+        self.plan = plan
+        self.num_questions = num_questions
+        self.on_question = on_question
+        self.questions = []
+        self.errors = []
+        self._seen = set()
+        self._accepted = [0] * len(plan)
+        self._spares = []
+    
+    def _emit(self, question):
+        self.questions.append(question)
+        if self.on_question:
+            self.on_question(len(self.questions) - 1, question)
+    
+    def add(self, index, batch, error=None):
+        if error:
+            self.errors.append(error)
+        for question in merge_unique_questions([batch], self._seen):
+            if self._accepted[index] < self.plan[index][2] and len(self.questions) < self.num_questions:
+                self._accepted[index] += 1
+                self._emit(question)
+            else:
+                self._spares.append(question)
+    
+    def finish(self, quiz_level, top_up=True):
+        """Return (questions, error); a quiz left short by a failed sub-request is an error
+        
+        top_up=False skips the extra request for a quiz that is merely short (the
+        model returned too few questions or duplicates), but a sub-request that failed
+        part-way is always topped up once.
+        """
+        for question in self._spares:
+            if len(self.questions) < self.num_questions:
+                self._emit(question)
+        
+        # Top up once if failed sub-requests or duplicates left the quiz short
+        shortfall = self.num_questions - len(self.questions)
+        if (top_up or self.errors) and shortfall > 0 and self.questions:
+            index = max(range(len(self.plan)), key=lambda i: self.plan[i][2] - self._accepted[i])
+            prompt = build_prompt(
+                self.plan[index][0], quiz_level, shortfall,
+                batch_note(len(self.plan) + 1, len(self.plan) + 1, self.questions)
+            )
+            extra, error = request_questions(prompt)
+            if error:
+                self.errors.append(error)
+            for question in merge_unique_questions([extra], self._seen)[:shortfall]:
+                self._emit(question)
+        
+        if not self.questions:
+            return None, self.errors[0] if self.errors else "Failed to parse quiz questions from response"
+        if self.errors and len(self.questions) < self.num_questions:
+            return None, (f"Only {len(self.questions)} of {self.num_questions} questions could be generated: "
+                          f"{self.errors[0]}")
+        return self.questions, None
+
+def generate_questions_parallel(plan, quiz_level, num_questions):
+    """Run sub-requests concurrently and merge their results"""
+    with ThreadPoolExecutor(max_workers=max(1, min(FANOUT_MAX_WORKERS, len(plan)))) as executor:
+        futures = [profiling.submit_in_context(executor, request_questions, prompt) for _, prompt, _ in plan]
+        results = [future.result() for future in futures]
+    
+    merger = QuotaMerger(plan, num_questions)
+    for index, (batch, error) in enumerate(results):
+        merger.add(index, batch, error)
+    return merger.finish(quiz_level)
+
+def generate_questions(text_content, quiz_level, num_questions=3, variant=0):
+    """Call Gemini and parse the questions, bypassing the cache"""
+    
+    if not load_model():
+        return None, "Gemini model not initialized"
+    
+    plan = plan_requests(text_content, quiz_level, num_questions, variant)
+    if len(plan) == 1:
+        return request_questions(plan[0][1])
+    return generate_questions_parallel(plan, quiz_level, num_questions)
+
+def stream_batch(index, prompt, events, levels=None, replies=None):
+    """Stream one prompt, pushing each question onto events as soon as it closes
+    
+    For a multi-level prompt only levels[0] is streamed; every level parsed from the
+    complete reply is stored in replies[index].
+    """
+    try:
+        parser = MCQStreamParser(levels[0]) if levels else MCQStreamParser()
+        model = get_model()
+        stream = get_resilience_policy().stream(
+            lambda: model.generate_content(prompt, stream=True, **generation_options(levels))
+        )
+        with profiling.phase("stream"), observe_model_call(model, "stream"):
+            for chunk in stream:
+                questions = validate_questions(parser.feed(chunk.text))
+                if questions:
+                    events.put((index, questions, None))
+        
+        if levels:
+            replies[index] = parse_level_set(parser.text, levels)
+            if not parser.count:
+                if replies[index][levels[0]]:
+                    events.put((index, replies[index][levels[0]], None))
+                else:
+                    level_set, error = request_questions(prompt, levels)
+                    if level_set:
+                        replies[index] = level_set
+                    events.put((index, level_set[levels[0]] if level_set else None, error))
+        # The reply did not have the expected shape; fall back to a full parse
+        elif not parser.count:
+            parsed_data = validate_and_parse_json(parser.text)
+            if parsed_data and "mcqs" in parsed_data:
+                events.put((index, parsed_data["mcqs"], None))
+            else:
+                # Nothing was shown yet, so retry as a regular request
+                events.put((index, *request_questions(prompt)))
+    except Exception as e:
+        events.put((index, None, f"Error generating questions: {str(e)}"))
+    finally:
+        events.put((index, None, None))
+
+def stream_questions(text_content, quiz_level, num_questions, on_question, variant=0):
+    """Generate questions with streaming, calling on_question(index, question) as each arrives"""
+    
+    if not load_model():
+        return None, "Gemini model not initialized"
+    
+    plan = plan_requests(text_content, quiz_level, num_questions, variant)
+    merger = QuotaMerger(plan, num_questions, on_question)
+    
+    # Workers only enqueue; on_question runs on the calling (script) thread
+    events = queue.Queue()
+    with ThreadPoolExecutor(max_workers=max(1, min(FANOUT_MAX_WORKERS, len(plan)))) as executor:
+        for index, (_, prompt, _) in enumerate(plan):
+            profiling.submit_in_context(executor, stream_batch, index, prompt, events)
+        pending = len(plan)
+        while pending:
+            index, batch, error = events.get()
+            if batch is None and error is None:
+                pending -= 1
+            else:
+                merger.add(index, batch, error)
+    
+    # A complete single request is used as-is, like the non-streaming path
+    return merger.finish(quiz_level, top_up=len(plan) > 1)
+
+def generate_level_set(text_content, quiz_level, num_questions, on_question=None, variant=0):
+    """Generate a quiz for every level from shared requests, returning ({level: questions}, error)
+    
+    Each sub-request asks for all levels at once, so the source text is sent once rather
+    than once per level. Only quiz_level is streamed to on_question and topped up when
+    short; the other levels are kept only when complete. error refers to quiz_level.
+    """
+    
+    if not load_model():
+        return None, "Gemini model not initialized"
+    
+    levels = [quiz_level] + [level for level in QUIZ_LEVELS if level != quiz_level]
+    plan = plan_requests(text_content, quiz_level, num_questions, variant, levels)
+    mergers = {level: QuotaMerger(plan, num_questions) for level in levels}
+    mergers[quiz_level].on_question = on_question
+    replies = [None] * len(plan)
+    
+    with ThreadPoolExecutor(max_workers=max(1, min(FANOUT_MAX_WORKERS, len(plan)))) as executor:
+        if on_question:
+            # Workers only enqueue; on_question runs on the calling (script) thread
+            events = queue.Queue()
+            for index, (_, prompt, _) in enumerate(plan):
+                profiling.submit_in_context(executor, stream_batch, index, prompt, events, levels, replies)
+            pending = len(plan)
+            while pending:
+                index, batch, error = events.get()
+                if batch is None and error is None:
+                    pending -= 1
+                else:
+                    mergers[quiz_level].add(index, batch, error)
+        else:
+            futures = [profiling.submit_in_context(executor, request_questions, prompt, levels)
+                       for _, prompt, _ in plan]
+            for index, future in enumerate(futures):
+                replies[index], error = future.result()
+                mergers[quiz_level].add(index, replies[index][quiz_level] if replies[index] else None, error)
+    
+    level_sets = {}
+    for level in levels[1:]:
+        for index, reply in enumerate(replies):
+            mergers[level].add(index, reply[level] if reply else None)
+        questions, _ = mergers[level].finish(level, top_up=False)
+        if questions and len(questions) == num_questions:
+            level_sets[level] = questions
+    
+    questions, error = mergers[quiz_level].finish(quiz_level, top_up=len(plan) > 1)
+    if questions:
+        level_sets[quiz_level] = questions
+    return level_sets, error
+
+def prompt_version_for(text_content):
+    """Prompt version for the cache key; quizzes from trimmed text are keyed by the budget"""
+    if COMPACTION_ENABLED and COMPACT_TOKEN_BUDGET > 0 and estimate_tokens(text_content) > COMPACT_TOKEN_BUDGET:
+        return f"{PROMPT_VERSION}{COMPACT_TOKEN_BUDGET}"
+    return PROMPT_VERSION
+
+def compact_for_prompt(text_content, model_name):
+    """Source text as it will be prompted, reporting the tokens compaction saved"""
+    if not COMPACTION_ENABLED:
+        return text_content
+    with profiling.phase("compact"):
+        compacted, report = compact_text(text_content, COMPACT_TOKEN_BUDGET)
+    profiling.annotate(input_tokens=report["input_tokens"], tokens_saved=report["tokens_saved"])
+    metrics.INPUT_TOKENS_SAVED.inc(max(0, report["tokens_saved"]), model=model_name)
+    return compacted
+
+def observe_fetch(started, model_name, quiz_level, num_questions, source, questions):
+    """Record the latency and questions served of one fetch_questions_gemini call in metrics"""
+    labels = {"model": model_name, "level": quiz_level, "num_questions": num_questions, "source": source}
+    metrics.GENERATION_SECONDS.observe(time.perf_counter() - started, **labels)
+    if questions:
+        metrics.QUESTIONS_SERVED.inc(len(questions), **labels)
+
+@profiling.traced("generation")
+def fetch_questions_gemini(text_content, quiz_level, num_questions=3, on_question=None, topic=None, variant=0):
+    """Generate quiz questions from text content using Gemini API
+    
+    When on_question is given, the reply is streamed and on_question(index, question)
+    is called for each question as soon as it is available. topic names the subject
+    of short inputs so banked questions on the same topic can be reused. A nonzero
+    variant asks for an alternate quiz on the same content, cached separately.
+    """
+    
+    started = time.perf_counter()
+    model = load_model()
+    if not model:
+        observe_fetch(started, MODEL_NAME, quiz_level, num_questions, "error", None)
+        return None, "Failed to initialize Gemini API. Please check your API key."
+    
+    if not text_content.strip():
+        return None, "Text content is empty"
+    
+    profiling.annotate(level=quiz_level, num_questions=num_questions, streaming=bool(on_question), variant=variant)
+    cache = get_question_cache()
+    prompt_version = prompt_version_for(text_content)
+    cache_key = make_cache_key(text_content, quiz_level, num_questions, model.model_name, prompt_version, variant)
+    cached_questions = cache.get(cache_key)
+    profiling.checkpoint("cache")
+    source = "cache" if cached_questions is not None else None
+    
+    # Short topics are too easy to confuse ("mitosis" vs "meiosis") for fuzzy matching,
+    # and alternate versions must not be served another text's original quiz
+    similarity = None
+    if topic is None and not variant and len(text_content.split()) >= SIMILARITY_MIN_WORDS:
+        similarity = get_similarity_index()
+    sketch = scope = None
+    if cached_questions is None and similarity:
+        scope = similarity_scope(quiz_level, num_questions, model.model_name, prompt_version)
+        sketch = similarity.fingerprint(text_content)
+        match = similarity.find(sketch, scope)
+        if match:
+            cached_questions = cache.get(match[0])
+            if cached_questions is not None:
+                cache.set(cache_key, cached_questions)
+                source = "similarity"
+        profiling.checkpoint("similarity")
+    
+    bank = get_question_bank()
+    source_hash = content_hash(text_content)
+    # Alternate versions are always freshly generated, or they would repeat banked questions
+    if cached_questions is None and bank and BANK_SERVE_ENABLED and not variant:
+        cached_questions = bank.assemble_quiz(source_hash, quiz_level, model.model_name, num_questions, topic)
+        if cached_questions is not None:
+            cache.set(cache_key, cached_questions)
+            if sketch:
+                similarity.add(cache_key, sketch, scope)
+            source = "bank"
+        profiling.checkpoint("bank")
+    
+    if cached_questions is not None:
+        profiling.annotate(source=source)
+        observe_fetch(started, model.model_name, quiz_level, num_questions, source, cached_questions)
+        if on_question:
+            for index, question in enumerate(cached_questions):
+                on_question(index, question)
+        return cached_questions, None
+    
+    def generate(publish):
+        stream_to = (lambda index, question: publish((index, question))) if on_question else None
+        # Only the prompt sees the compacted text; cache, similarity and bank are keyed by the original
+        prompt_text = compact_for_prompt(text_content, model.model_name)
+        if MULTI_LEVEL_ENABLED and quiz_level in QUIZ_LEVELS:
+            level_sets, error = generate_level_set(prompt_text, quiz_level, num_questions, stream_to, variant)
+            questions = level_sets.get(quiz_level) if level_sets else None
+            store_other_levels(level_sets or {})
+        elif on_question:
+            questions, error = stream_questions(prompt_text, quiz_level, num_questions, stream_to, variant)
+        else:
+            questions, error = generate_questions(prompt_text, quiz_level, num_questions, variant)
+        # A short quiz is served but not stored, or it would be reused as a full-size one
+        if questions and len(questions) >= num_questions:
+            cache.set(cache_key, questions)
+            if sketch:
+                # Index this text under its own key now that a quiz exists for it
+                similarity.add(cache_key, sketch, scope)
+            if bank:
+                bank.add_questions(source_hash, topic or derive_topic(text_content), quiz_level,
+                                   model.model_name, questions, derived_topic=topic is None)
+        return questions, error
+    
+    def store_other_levels(level_sets):
+        """Cache the levels generated alongside quiz_level, keeping any quiz already cached for them"""
+        for level, questions in level_sets.items():
+            level_key = make_cache_key(text_content, level, num_questions, model.model_name, prompt_version, variant)
+            if level == quiz_level or cache.get(level_key) is not None:
+                continue
+            cache.set(level_key, questions)
+            if sketch:
+                similarity.add(level_key, sketch, similarity_scope(level, num_questions, model.model_name, prompt_version))
+            if bank:
+                bank.add_questions(source_hash, topic or derive_topic(text_content), level,
+                                   model.model_name, questions, derived_topic=topic is None)
+    
+    def published():
+        """Result of the same request finished by another process, if any"""
+        # Polled while waiting, so it must not count as cache misses
+        questions = cache.get(cache_key, count=False)
+        return (questions, None) if questions is not None else None
+    
+    # Identical requests already in flight share one generation instead of each calling the model
+    delivered = []
+    def deliver(item):
+        delivered.append(item)
+        on_question(*item)
+    
+    questions, error = get_single_flight().do(cache_key, generate, lookup=published,
+                                              on_item=deliver if on_question else None)
+    profiling.checkpoint("generate")
+    profiling.annotate(source="model", error=error)
+    observe_fetch(started, model.model_name, quiz_level, num_questions, "error" if error else "model", questions)
+    if on_question and questions:
+        # Questions that were not streamed to this caller (e.g. another process generated them)
+        for index in range(len(delivered), len(questions)):
+            on_question(index, questions[index])
+    return questions, error
@@ -0,0 +1,102 @@
+"""Index-based, vectorized grading.
+
+A quiz is compiled once into an AnswerKey holding the index of each question's
+correct option. Submissions are arrays of selected option indices (-1 for
+unanswered), so a whole class is graded with a few array operations, and two
+options with the same text can never be confused.
+"""
+
+from bisect import bisect_right
+
+import numpy as np
+
+from quiz_parsing import OPTION_KEYS
+
+UNANSWERED = -1
+
+# Lower bounds (percent) of each letter grade above F
+GRADE_THRESHOLDS = [60, 70, 80, 90]
+GRADE_LABELS = ["F", "C", "B", "A", "A+"]
+GRADE_EMOJI = ["📚", "🥉", "🥈", "🥇", "🏆"]
+
+
+def letter_grade(percentage):
+    """(letter, emoji) for one percentage"""
+    band = bisect_right(GRADE_THRESHOLDS, percentage)
+    return GRADE_LABELS[band], GRADE_EMOJI[band]
+
+
+def letter_grades(percentages):
+    """Letter grades for an array of percentages"""
+    bands = np.searchsorted(GRADE_THRESHOLDS, percentages, side="right")
+    return np.asarray(GRADE_LABELS)[bands]
+
+
+class AnswerKey:
+    """A quiz compiled to option indices"""
+
+    def __init__(self, questions):
+        self.option_keys = []
+        correct = []
+        for question in questions:
+            options = question.get("options") or {}
+            keys = [key for key in OPTION_KEYS if key in options] or list(options)
+            self.option_keys.append(keys)
+            letter = str(question.get("correct", "")).strip().lower()
+            correct.append(keys.index(letter) if letter in keys else UNANSWERED)
+        self.correct = np.asarray(correct, dtype=np.int8)
+        self.num_questions = len(questions)
+        self.max_options = max((len(keys) for keys in self.option_keys), default=0)
+
+    def encode(self, selected_answers):
+        """Turn {question index: option index or None} into a response row"""
+        row = np.full(self.num_questions, UNANSWERED, dtype=np.int8)
+        for i, selected in selected_answers.items():
+            if selected is not None and 0 <= i < self.num_questions:
+                row[i] = selected
+        return row
+
+
+def grade_submissions(key, responses):
+    """Grade a (students x questions) array of option indices in one pass
+
+    Returns a dict of arrays: per-student scores, percentages and letter grades,
+    the correctness matrix, and per-question difficulty (share answering
+    correctly), discrimination (correlation of a question with the rest of the
+    quiz, NaN when undefined) and option_counts (how often each option was picked).
+    """
+    responses = np.atleast_2d(np.asarray(responses, dtype=np.int8))
+    num_students, num_questions = responses.shape
+    if num_questions != key.num_questions:
+        raise ValueError(f"Expected {key.num_questions} answers per submission, got {num_questions}")
+
+    # A question whose answer could not be resolved is UNANSWERED in the key; blanks must not match it
+    correct = (responses == key.correct) & (responses != UNANSWERED)
+    scores = correct.sum(axis=1)
+    percentages = scores * (100.0 / num_questions) if num_questions else np.zeros(num_students)
+
+    # Corrected point-biserial: correlate each item with the score on the other items
+    items = correct.astype(np.float64)
+    rest = scores[:, None] - items
+    items_centered = items - items.mean(axis=0)
+    rest_centered = rest - rest.mean(axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        discrimination = (items_centered * rest_centered).sum(axis=0) / np.sqrt(
+            (items_centered ** 2).sum(axis=0) * (rest_centered ** 2).sum(axis=0)
+        )
+
+    answered = (responses >= 0) & (responses < key.max_options)
+    flat = (responses + np.arange(num_questions) * key.max_options)[answered]
+    option_counts = np.bincount(flat, minlength=num_questions * key.max_options).reshape(
+        num_questions, key.max_options
+    )
+
+    return {
+        "scores": scores,
+        "percentages": percentages,
+        "grades": letter_grades(percentages),
+        "correct": correct,
+        "difficulty": correct.mean(axis=0) if num_students else np.zeros(num_questions),
+        "discrimination": discrimination,
+        "option_counts": option_counts,
+    }
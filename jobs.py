@@ -0,0 +1,124 @@
+"""Background generation jobs.
+
+Generation is submitted to a shared executor and tracked by job ID, so a
+session's script thread is never blocked on the model: the UI polls the job on
+later reruns, shows questions as they arrive and can cancel it. A cancelled job
+that has not started never runs; one that is already talking to the model runs
+to completion in the background, so its result still lands in the cache.
+"""
+
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+
+class Job:
+    """State of one background generation"""
+
+    def __init__(self, total):
+        self.id = uuid.uuid4().hex
+        self.total = total
+        self.status = QUEUED
+        self.questions = []
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+        self.future = None
+        self._lock = threading.Lock()
+
+    def add_question(self, index, question):
+        """on_question callback: record a question as soon as it is generated"""
+        with self._lock:
+            self.questions.append(question)
+
+    def snapshot(self):
+        """(status, questions so far) read consistently"""
+        with self._lock:
+            return self.status, list(self.questions)
+
+    @property
+    def finished(self):
+        return self.status in (DONE, FAILED, CANCELLED)
+
+
+class JobManager:
+    """Runs jobs on a shared executor and keeps them around for polling"""
+
+    def __init__(self, max_workers=4, retention_seconds=900):
+        self.retention_seconds = retention_seconds
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="lexify-job")
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, fn, total, *args, **kwargs):
+        """Run fn(*args, on_question=job.add_question, **kwargs) -> (questions, error) as a job"""
+        self.prune()
+        job = Job(total)
+
+        def run():
+            with job._lock:
+                if job.status == CANCELLED:
+                    return
+                job.status = RUNNING
+            try:
+                questions, error = fn(*args, on_question=job.add_question, **kwargs)
+            except Exception as e:
+                questions, error = None, f"Error generating questions: {e}"
+            with job._lock:
+                job.result, job.error = questions, error
+                job.finished_at = time.time()
+                # A cancelled job keeps its status; its result only went to the cache
+                if job.status != CANCELLED:
+                    job.status = DONE if questions else FAILED
+
+        with self._lock:
+            self._jobs[job.id] = job
+        job.future = self._executor.submit(run)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        """Cancel a job; returns False if it had already finished"""
+        job = self.get(job_id)
+        if job is None:
+            return False
+        with job._lock:
+            if job.finished:
+                return False
+            job.status = CANCELLED
+            job.finished_at = time.time()
+        job.future.cancel()
+        return True
+
+    def prune(self):
+        """Forget finished jobs older than the retention period"""
+        cutoff = time.time() - self.retention_seconds
+        with self._lock:
+            for job_id in [job_id for job_id, job in self._jobs.items()
+                           if job.finished_at is not None and job.finished_at < cutoff]:
+                del self._jobs[job_id]
+
+    def stats(self):
+        with self._lock:
+            jobs = list(self._jobs.values())
+        counts = {}
+        for job in jobs:
+            counts[job.status] = counts.get(job.status, 0) + 1
+        return counts
+
+
+def create_job_manager_from_env():
+    """Build the JobManager with LEXIFY_JOB_WORKERS threads"""
+    return JobManager(max_workers=int(os.getenv("LEXIFY_JOB_WORKERS", "4")))
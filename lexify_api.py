@@ -0,0 +1,363 @@
+"""Headless HTTP API for LMS integrations.
+
+A small HTTP/1.1 server on asyncio with keep-alive. Generation runs on a bounded
+worker pool through the same cache, bank and backend as the app; quizzes are
+interned in the shared quiz store so they can be fetched and graded by ID.
+
+    python lexify_api.py --host 0.0.0.0 --port 8080
+
+    POST /v1/quizzes               {"text": ..., "level": "beginner", "num_questions": 5}
+                                   or {"questions": [...]} / {"response_text": ...} to register a quiz
+    GET  /v1/quizzes/<id>          ?answers=1 includes correct options and explanations
+    POST /v1/quizzes/<id>/grade    {"answers": ["b", 2, null, ...]} or {"submissions": [[...], ...]}
+    GET  /healthz
+    GET  /metrics                  Prometheus text format
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import re
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import suppress
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlsplit
+
+import metrics
+import generation
+from grading import UNANSWERED, grade_submissions
+from quiz_parsing import OPTION_KEYS, validate_questions
+
+LEVELS = ("beginner", "intermediate", "advanced")
+MAX_QUESTIONS = 50
+
+_QUIZ_PATH = re.compile(r"^/v1/quizzes/([0-9a-f]{16})$")
+_GRADE_PATH = re.compile(r"^/v1/quizzes/([0-9a-f]{16})/grade$")
+
+
+PENDING_GENERATIONS = metrics.REGISTRY.gauge(
+    "lexify_api_pending_generations", "Generation requests admitted and not yet finished")
+OPEN_CONNECTIONS = metrics.REGISTRY.gauge("lexify_api_connections", "Open client connections")
+API_REQUESTS = metrics.REGISTRY.counter("lexify_api_requests_total", "Requests handled, by status code", ["status"])
+
+
+class HTTPError(Exception):
+    """Raised by handlers to send an error response"""
+
+    def __init__(self, status, message, headers=None):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.headers = headers or {}
+
+
+def quiz_payload(quiz, include_answers=False):
+    """JSON view of an interned quiz"""
+    questions = []
+    for question in quiz.questions:
+        item = {"mcq": question.mcq, "options": dict(zip(OPTION_KEYS, question.options))}
+        if include_answers:
+            item["correct"] = OPTION_KEYS[question.correct] if question.correct != UNANSWERED else None
+            item["explanation"] = question.explanation
+        questions.append(item)
+    return {"quiz_id": quiz.quiz_id, "num_questions": len(quiz), "questions": questions}
+
+
+def parse_answer(answer, num_options):
+    """An option index from an index, a letter or null"""
+    if answer is None:
+        return UNANSWERED
+    if isinstance(answer, str) and answer.strip().lower() in OPTION_KEYS[:num_options]:
+        return OPTION_KEYS.index(answer.strip().lower())
+    if isinstance(answer, int) and not isinstance(answer, bool) and 0 <= answer < num_options:
+        return answer
+    raise HTTPError(HTTPStatus.BAD_REQUEST, f"Invalid answer {answer!r}; use a letter a-d, an index or null")
+
+
+def _finite(value):
+    value = float(value)
+    return round(value, 4) if math.isfinite(value) else None
+
+
+class LexifyAPI:
+    """Request routing, limits and connection handling"""
+
+    def __init__(self, workers=8, max_pending=32, max_connections=256, keepalive_timeout=15.0,
+                 max_body_bytes=1_000_000):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="lexify-api")
+        self.max_pending = max_pending
+        self.max_connections = max_connections
+        self.keepalive_timeout = keepalive_timeout
+        self.max_body_bytes = max_body_bytes
+        # Only touched from the event loop thread, so plain integers are enough
+        self.pending = 0
+        self.connections = 0
+        self.requests = 0
+        self.rejected = 0
+
+    # Handlers
+
+    async def generate(self, body):
+        if "questions" in body or "response_text" in body:
+            return self.register(body)
+
+        text = body.get("text")
+        level = str(body.get("level", "intermediate")).lower()
+        num_questions = body.get("num_questions", 5)
+        if not isinstance(text, str) or not text.strip():
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "text must be a non-empty string")
+        if level not in LEVELS:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f"level must be one of {', '.join(LEVELS)}")
+        if not isinstance(num_questions, int) or not 1 <= num_questions <= MAX_QUESTIONS:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f"num_questions must be an integer from 1 to {MAX_QUESTIONS}")
+
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise HTTPError(HTTPStatus.SERVICE_UNAVAILABLE, "Too many generation requests in progress",
+                            {"Retry-After": "1"})
+        self.pending += 1
+        try:
+            topic = text.strip() if len(text.split()) < 20 else None
+            questions, error = await asyncio.get_running_loop().run_in_executor(
+                self.executor, generation.fetch_questions_gemini,
+                generation.prepare_content(text), level, num_questions, None, topic,
+            )
+        finally:
+            self.pending -= 1
+        if error:
+            raise HTTPError(HTTPStatus.BAD_GATEWAY, error)
+
+        quiz = generation.get_quiz_store().intern(questions)
+        payload = quiz_payload(quiz, include_answers=bool(body.get("include_answers")))
+        payload["level"] = level
+        return HTTPStatus.CREATED, payload
+
+    def register(self, body):
+        """Store a quiz generated elsewhere after validating it like a model reply"""
+        if "response_text" in body:
+            parsed = generation.validate_and_parse_json(str(body["response_text"]))
+            questions = parsed["mcqs"] if parsed else []
+        else:
+            questions = validate_questions(body["questions"])
+        if not questions:
+            raise HTTPError(HTTPStatus.UNPROCESSABLE_ENTITY, "No valid questions found")
+        quiz = generation.get_quiz_store().intern(questions)
+        return HTTPStatus.CREATED, quiz_payload(quiz, include_answers=True)
+
+    def get_quiz(self, quiz_id, query):
+        quiz = generation.get_quiz_store().get(quiz_id)
+        if quiz is None:
+            raise HTTPError(HTTPStatus.NOT_FOUND, "Unknown or expired quiz")
+        include_answers = query.get("answers", ["0"])[0].lower() in ("1", "true", "yes")
+        return HTTPStatus.OK, quiz_payload(quiz, include_answers)
+
+    def grade(self, quiz_id, body):
+        quiz = generation.get_quiz_store().get(quiz_id)
+        if quiz is None:
+            raise HTTPError(HTTPStatus.NOT_FOUND, "Unknown or expired quiz")
+
+        single = "submissions" not in body
+        submissions = [body.get("answers")] if single else body["submissions"]
+        if not isinstance(submissions, list) or not submissions or not all(
+            isinstance(answers, list) and len(answers) == len(quiz) for answers in submissions
+        ):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f"Each submission must be a list of {len(quiz)} answers")
+
+        responses = [
+            [parse_answer(answer, len(question.options)) for answer, question in zip(answers, quiz.questions)]
+            for answers in submissions
+        ]
+        with metrics.GRADING_SECONDS.time(num_questions=len(quiz)):
+            report = grade_submissions(quiz.key, responses)
+        metrics.SUBMISSIONS_GRADED.inc(len(responses), num_questions=len(quiz))
+        graded = [
+            {"score": int(score), "total": len(quiz), "percentage": round(float(percentage), 2), "grade": str(grade)}
+            for score, percentage, grade in zip(report["scores"], report["percentages"], report["grades"])
+        ]
+        if single:
+            result = graded[0]
+            result["correct"] = report["correct"][0].tolist()
+            return HTTPStatus.OK, result
+        return HTTPStatus.OK, {
+            "submissions": graded,
+            "questions": [
+                {"difficulty": _finite(difficulty), "discrimination": _finite(discrimination),
+                 "option_counts": counts.tolist()}
+                for difficulty, discrimination, counts in zip(
+                    report["difficulty"], report["discrimination"], report["option_counts"]
+                )
+            ],
+        }
+
+    def health(self):
+        return HTTPStatus.OK, {
+            "status": "ok",
+            "pending_generations": self.pending,
+            "connections": self.connections,
+            "requests": self.requests,
+            "rejected": self.rejected,
+            "quizzes": len(generation.get_quiz_store()),
+        }
+
+    def metrics(self):
+        PENDING_GENERATIONS.set(self.pending)
+        OPEN_CONNECTIONS.set(self.connections)
+        return HTTPStatus.OK, metrics.REGISTRY.render()
+
+    async def dispatch(self, method, target, body_bytes):
+        url = urlsplit(target)
+        path, query = url.path.rstrip("/") or "/", parse_qs(url.query)
+
+        body = {}
+        if method == "POST":
+            try:
+                body = json.loads(body_bytes or b"{}")
+            except (ValueError, RecursionError):
+                # JSONDecodeError and UnicodeDecodeError are ValueErrors; deep nesting raises RecursionError
+                raise HTTPError(HTTPStatus.BAD_REQUEST, "Body must be JSON") from None
+            if not isinstance(body, dict):
+                raise HTTPError(HTTPStatus.BAD_REQUEST, "Body must be a JSON object")
+
+        if path == "/healthz" and method == "GET":
+            return self.health()
+        if path == "/metrics" and method == "GET":
+            return self.metrics()
+        if path == "/v1/quizzes" and method == "POST":
+            return await self.generate(body)
+        match = _QUIZ_PATH.match(path)
+        if match and method == "GET":
+            return self.get_quiz(match.group(1), query)
+        match = _GRADE_PATH.match(path)
+        if match and method == "POST":
+            return self.grade(match.group(1), body)
+        if path in ("/healthz", "/metrics", "/v1/quizzes") or _QUIZ_PATH.match(path) or _GRADE_PATH.match(path):
+            raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED, f"{method} is not allowed here")
+        raise HTTPError(HTTPStatus.NOT_FOUND, "Not found")
+
+    # Connections
+
+    async def _respond(self, writer, status, payload, keep_alive, headers=None):
+        API_REQUESTS.inc(status=status.value)
+        if isinstance(payload, str):
+            body, content_type = payload.encode("utf-8"), metrics.CONTENT_TYPE
+        else:
+            body, content_type = json.dumps(payload, ensure_ascii=False).encode("utf-8"), "application/json; charset=utf-8"
+        lines = [
+            f"HTTP/1.1 {status.value} {status.phrase}",
+            f"Content-Type: {content_type}",
+            f"Content-Length: {len(body)}",
+            f"Connection: {'keep-alive' if keep_alive else 'close'}",
+        ]
+        if keep_alive:
+            lines.append(f"Keep-Alive: timeout={int(self.keepalive_timeout)}")
+        lines.extend(f"{name}: {value}" for name, value in (headers or {}).items())
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body)
+        await writer.drain()
+
+    async def handle_connection(self, reader, writer):
+        if self.connections >= self.max_connections:
+            self.rejected += 1
+            with suppress(ConnectionError):
+                await self._respond(writer, HTTPStatus.SERVICE_UNAVAILABLE,
+                                    {"error": "Too many connections"}, False, {"Retry-After": "1"})
+            writer.close()
+            return
+
+        self.connections += 1
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), self.keepalive_timeout)
+                except asyncio.LimitOverrunError:
+                    await self._respond(writer, HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE,
+                                        {"error": "Headers too large"}, False)
+                    break
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+                    break
+
+                try:
+                    request_line, *header_lines = head.decode("latin-1").split("\r\n")
+                    method, target, version = request_line.split(" ", 2)
+                    headers = {}
+                    for line in header_lines:
+                        if line:
+                            name, _, value = line.partition(":")
+                            headers[name.strip().lower()] = value.strip()
+                    length = int(headers.get("content-length", "0"))
+                    if length < 0:
+                        raise ValueError("negative Content-Length")
+                except ValueError:
+                    await self._respond(writer, HTTPStatus.BAD_REQUEST, {"error": "Malformed request"}, False)
+                    break
+                if "transfer-encoding" in headers:
+                    await self._respond(writer, HTTPStatus.LENGTH_REQUIRED, {"error": "Send a Content-Length body"}, False)
+                    break
+                if length > self.max_body_bytes:
+                    await self._respond(writer, HTTPStatus.REQUEST_ENTITY_TOO_LARGE, {"error": "Body too large"}, False)
+                    break
+
+                try:
+                    # Bounded like the header read, so a slow client cannot hold a connection slot
+                    body = await asyncio.wait_for(reader.readexactly(length), self.keepalive_timeout) if length else b""
+                except asyncio.TimeoutError:
+                    await self._respond(writer, HTTPStatus.REQUEST_TIMEOUT, {"error": "Body not received in time"}, False)
+                    break
+                connection = headers.get("connection", "").lower()
+                keep_alive = connection != "close" if version == "HTTP/1.1" else connection == "keep-alive"
+
+                self.requests += 1
+                extra_headers = None
+                try:
+                    status, payload = await self.dispatch(method.upper(), target, body)
+                except HTTPError as e:
+                    status, payload, extra_headers = e.status, {"error": e.message}, e.headers
+                except Exception as e:
+                    print(f"Unhandled error for {method} {target}: {e!r}", file=sys.stderr)
+                    status, payload = HTTPStatus.INTERNAL_SERVER_ERROR, {"error": "Internal server error"}
+                await self._respond(writer, status, payload, keep_alive, extra_headers)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.connections -= 1
+            writer.close()
+            with suppress(Exception):
+                await writer.wait_closed()
+
+
+async def serve(host, port, api):
+    server = await asyncio.start_server(api.handle_connection, host, port, backlog=1024)
+    addresses = ", ".join(str(sock.getsockname()) for sock in server.sockets)
+    print(f"LEXIFY API listening on {addresses}", file=sys.stderr)
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the LEXIFY quiz API over HTTP")
+    parser.add_argument("--host", default=os.getenv("LEXIFY_API_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("LEXIFY_API_PORT", "8080")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("LEXIFY_API_WORKERS", "8")),
+                        help="Threads running generation calls")
+    parser.add_argument("--max-pending", type=int, default=int(os.getenv("LEXIFY_API_MAX_PENDING", "32")),
+                        help="Generation requests admitted at once; more get 503")
+    parser.add_argument("--max-connections", type=int, default=int(os.getenv("LEXIFY_API_MAX_CONNECTIONS", "256")))
+    parser.add_argument("--keepalive", type=float, default=float(os.getenv("LEXIFY_API_KEEPALIVE", "15")),
+                        help="Seconds an idle keep-alive connection stays open")
+    args = parser.parse_args()
+
+    api = LexifyAPI(args.workers, args.max_pending, args.max_connections, args.keepalive)
+    # GET /metrics is always served; this adds LEXIFY_METRICS_FILE or a separate port if configured
+    metrics.start_exporters_from_env()
+    try:
+        asyncio.run(serve(args.host, args.port, api))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""Pre-generate quiz banks for a directory of documents.
+
+Walks a corpus of text files and generates a quiz for every configured level and
+size using the same prompt, parsing and cache as the app. Each result is
+appended to a JSONL file as soon as it finishes, and every generated quiz lands
+in the shared question cache and question bank, so the app serves these documents without an API
+call. Re-running with the same output file skips jobs that already succeeded.
+
+    python lexify_batch.py corpus/ --output quiz_bank.jsonl --sizes 5 10 --workers 4
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime
+
+LEVELS = ["beginner", "intermediate", "advanced"]
+
+
+def find_documents(root, extensions):
+    """Return document paths under root, sorted for a stable job order"""
+    paths = []
+    for directory, _, files in os.walk(root):
+        for name in files:
+            if os.path.splitext(name)[1].lower() in extensions:
+                paths.append(os.path.join(directory, name))
+    return sorted(paths)
+
+
+def read_document(path):
+    """Read a document and return (text, content hash)"""
+    with open(path, encoding="utf-8", errors="replace") as handle:
+        text_content = handle.read()
+    return text_content, hashlib.sha256(text_content.encode("utf-8")).hexdigest()
+
+
+def job_key(source, content_hash, level, num_questions):
+    return f"{source}|{content_hash}|{level}|{num_questions}"
+
+
+def load_completed(output_path):
+    """Keys of jobs that already have a successful line in the output file"""
+    completed = set()
+    if not os.path.exists(output_path):
+        return completed
+    with open(output_path, encoding="utf-8") as handle:
+        for line in handle:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # A partial last line from an interrupted run
+                continue
+            if record.get("questions") and not record.get("error"):
+                completed.add(job_key(record["source"], record["content_hash"],
+                                      record["level"], record["num_questions"]))
+    return completed
+
+
+def run_job(path, source, level, num_questions):
+    """Generate one quiz in a worker process"""
+    import generation
+
+    started = time.perf_counter()
+    text_content, content_hash = read_document(path)
+    model = generation.load_model()
+
+    topic = text_content.strip() if len(text_content.split()) < 20 else None
+    questions, error = generation.fetch_questions_gemini(
+        generation.prepare_content(text_content), level, num_questions, topic=topic
+    )
+
+    return {
+        "source": source,
+        "content_hash": content_hash,
+        "level": level,
+        "num_questions": num_questions,
+        "model": model.model_name if model else None,
+        "prompt_version": generation.PROMPT_VERSION,
+        "questions": questions,
+        "error": error,
+        "elapsed_s": round(time.perf_counter() - started, 3),
+        "generated_at": datetime.now().isoformat(timespec="seconds"),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-generate LEXIFY quiz banks from a directory of documents")
+    parser.add_argument("corpus", help="Directory of documents to walk")
+    parser.add_argument("--output", default="quiz_bank.jsonl", help="JSONL file that results are appended to")
+    parser.add_argument("--levels", nargs="+", default=LEVELS, choices=LEVELS, help="Complexity levels to generate")
+    parser.add_argument("--sizes", nargs="+", type=int, default=[5], help="Question counts to generate")
+    parser.add_argument("--extensions", nargs="+", default=[".txt", ".md"], help="File extensions to include")
+    parser.add_argument("--workers", type=int, default=4, help="Worker processes")
+    parser.add_argument("--max-in-flight", type=int, default=0,
+                        help="Max submitted but unfinished jobs (default: twice the workers)")
+    args = parser.parse_args()
+
+    extensions = {ext.lower() if ext.startswith(".") else f".{ext.lower()}" for ext in args.extensions}
+    documents = find_documents(args.corpus, extensions)
+    completed = load_completed(args.output)
+
+    jobs = []
+    empty = 0
+    for path in documents:
+        source = os.path.relpath(path, args.corpus)
+        text_content, content_hash = read_document(path)
+        if not text_content.strip():
+            empty += 1
+            continue
+        for level in args.levels:
+            for num_questions in args.sizes:
+                if job_key(source, content_hash, level, num_questions) not in completed:
+                    jobs.append((path, source, level, num_questions))
+
+    skipped = (len(documents) - empty) * len(args.levels) * len(args.sizes) - len(jobs)
+    print(f"{len(documents)} documents ({empty} empty), {len(jobs)} jobs to run, {skipped} already done",
+          file=sys.stderr)
+    if not jobs:
+        return
+
+    max_in_flight = args.max_in_flight or args.workers * 2
+    succeeded = failed = 0
+    started = time.perf_counter()
+    pending = set()
+    queued = iter(jobs)
+
+    with open(args.output, "a", encoding="utf-8") as output, ProcessPoolExecutor(max_workers=args.workers) as executor:
+        while True:
+            # Keep a bounded number of jobs submitted so memory stays flat on huge corpora
+            for job in queued:
+                pending.add(executor.submit(run_job, *job))
+                if len(pending) >= max_in_flight:
+                    break
+            if not pending:
+                break
+
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    record = future.result()
+                except Exception as e:
+                    failed += 1
+                    print(f"Job failed: {e}", file=sys.stderr)
+                    continue
+                output.write(json.dumps(record, ensure_ascii=False) + "\n")
+                output.flush()
+                if record["error"]:
+                    failed += 1
+                    print(f"{record['source']} [{record['level']}, {record['num_questions']}]: {record['error']}",
+                          file=sys.stderr)
+                else:
+                    succeeded += 1
+            finished = succeeded + failed
+            print(f"{finished}/{len(jobs)} done ({finished / (time.perf_counter() - started):.2f} jobs/s)",
+                  file=sys.stderr)
+
+    print(f"Finished: {succeeded} succeeded, {failed} failed", file=sys.stderr)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,303 @@
+"""In-process metrics in the Prometheus text exposition format.
+
+Counters, gauges and histograms live in one process-wide registry. They can be
+scraped from a small HTTP endpoint (LEXIFY_METRICS_PORT), written periodically
+to a file for node_exporter's textfile collector (LEXIFY_METRICS_FILE), or read
+from the API's GET /metrics. Each process keeps its own values; Prometheus sums
+them across processes.
+"""
+
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; model calls take from well under a second to the call timeout
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30, 60, 120)
+# Seconds; grading a class is a handful of array operations
+GRADING_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.1)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    """A named metric with a fixed set of label names"""
+
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if len(labels) != len(self.labelnames) or set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} takes labels {', '.join(self.labelnames) or '(none)'}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _labels(self, key, extra=()):
+        pairs = list(zip(self.labelnames, key)) + list(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+    def _samples(self):
+        with self._lock:
+            return [(self.name + self._labels(key), value) for key, value in sorted(self._values.items())]
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(f"{series} {_format_value(value)}" for series, value in self._samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    """Monotonically increasing count"""
+
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        if amount < 0:
+            raise ValueError("Counters only go up")
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+
+class Gauge(_Metric):
+    """Value that can go up and down"""
+
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+
+class Histogram(_Metric):
+    """Distribution of observations in cumulative buckets"""
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                # Per-bucket (not cumulative) counts, then sum and count
+                series = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of the block, whether or not it raises"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def snapshot(self, **labels):
+        """(count, sum) for one label set"""
+        with self._lock:
+            series = self._values.get(self._key(labels))
+            return (series[2], series[1]) if series else (0, 0.0)
+
+    def _samples(self):
+        with self._lock:
+            items = [(key, list(counts), total, count) for key, (counts, total, count) in sorted(self._values.items())]
+        samples = []
+        for key, counts, total, count in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                samples.append((f"{self.name}_bucket{self._labels(key, [('le', _format_value(float(bound)))])}",
+                                cumulative))
+            samples.append((f"{self.name}_bucket{self._labels(key, [('le', '+Inf')])}", count))
+            samples.append((f"{self.name}_sum{self._labels(key)}", total))
+            samples.append((f"{self.name}_count{self._labels(key)}", count))
+        return samples
+
+
+class Registry:
+    """Process-wide set of metrics; asking for an existing name returns the same metric"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            elif type(metric) is not cls:
+                raise ValueError(f"{name} is already registered as a {metric.kind}")
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._get_or_create(Counter, name, documentation, labelnames)
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._get_or_create(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._get_or_create(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def render(self):
+        """All metrics in the Prometheus text format"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+
+REGISTRY = Registry()
+
+MODEL_CALL_SECONDS = REGISTRY.histogram(
+    "lexify_model_call_seconds", "Duration of generate_content calls (per attempt; streams until the last chunk)",
+    ["model", "mode"])
+MODEL_CALL_ERRORS = REGISTRY.counter(
+    "lexify_model_call_errors_total", "generate_content calls that raised, by exception type",
+    ["model", "mode", "error"])
+PARSE_FAILURES = REGISTRY.counter(
+    "lexify_parse_failures_total", "Model replies from which no valid questions could be parsed", ["model"])
+TOKENS = REGISTRY.counter(
+    "lexify_tokens_total", "Tokens reported by the model, by kind (prompt or response)", ["model", "kind"])
+INPUT_TOKENS_SAVED = REGISTRY.counter(
+    "lexify_input_tokens_saved_total", "Estimated prompt tokens removed from source text by compaction", ["model"])
+GENERATION_SECONDS = REGISTRY.histogram(
+    "lexify_generation_seconds", "Time to serve a quiz request, by where the quiz came from",
+    ["model", "level", "num_questions", "source"])
+QUESTIONS_SERVED = REGISTRY.counter(
+    "lexify_questions_served_total", "Questions returned to callers, by where they came from",
+    ["model", "level", "num_questions", "source"])
+SUBMISSIONS_GRADED = REGISTRY.counter(
+    "lexify_submissions_graded_total", "Answer sheets graded", ["num_questions"])
+GRADING_SECONDS = REGISTRY.histogram(
+    "lexify_grading_seconds", "Time to grade one batch of submissions", ["num_questions"], buckets=GRADING_BUCKETS)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    registry = REGISTRY
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = self.registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_http_server(port, host="127.0.0.1", registry=REGISTRY):
+    """Serve GET /metrics on a daemon thread; returns the server"""
+    handler = type("MetricsHandler", (_Handler,), {"registry": registry})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="lexify-metrics", daemon=True).start()
+    return server
+
+
+class FileExporter:
+    """Rewrite a metrics file every interval seconds, replacing it atomically"""
+
+    def __init__(self, path, interval=15.0, registry=REGISTRY):
+        self.path = path
+        self.interval = interval
+        self.registry = registry
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="lexify-metrics-file", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def write(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temporary = f"{self.path}.{os.getpid()}.tmp"
+        with open(temporary, "w", encoding="utf-8") as f:
+            f.write(self.registry.render())
+        os.replace(temporary, self.path)
+
+    def stop(self):
+        """Stop the thread after a final write"""
+        self._stop.set()
+        self.write()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.write()
+            except OSError as e:
+                print(f"Could not write metrics to {self.path}: {e}", file=sys.stderr)
+
+
+def start_exporters_from_env(registry=REGISTRY):
+    """Start the exporters configured by LEXIFY_METRICS_PORT and LEXIFY_METRICS_FILE
+
+    A "{pid}" in LEXIFY_METRICS_FILE is replaced by the process ID, so several worker
+    processes can each write their own file. Returns the started exporters.
+    """
+    exporters = []
+    port = int(os.getenv("LEXIFY_METRICS_PORT", "0"))
+    if port:
+        try:
+            exporters.append(start_http_server(port, os.getenv("LEXIFY_METRICS_HOST", "127.0.0.1"), registry))
+        except OSError as e:
+            # Typically another worker process already serves this port
+            print(f"Metrics endpoint not started on port {port}: {e}", file=sys.stderr)
+    path = os.getenv("LEXIFY_METRICS_FILE")
+    if path:
+        interval = float(os.getenv("LEXIFY_METRICS_INTERVAL", "15"))
+        exporters.append(FileExporter(path.replace("{pid}", str(os.getpid())), interval, registry).start())
+    return exporters
@@ -0,0 +1,122 @@
+"""Speculative prefetch of a session's next quiz.
+
+While a quiz is being answered, the next variant for the same content and
+settings is generated in the background so it is already in the question cache
+when the session asks for it. Each session may start only a limited number of
+prefetches, and queued prefetches for sessions that have gone idle are dropped
+before they reach the model.
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Sessions unseen for this long are forgotten, budget included
+SESSION_RETENTION_SECONDS = 24 * 3600
+
+
+class _Session:
+    """Prefetch bookkeeping for one session"""
+
+    __slots__ = ("last_seen", "used", "keys")
+
+    def __init__(self):
+        self.last_seen = time.time()
+        self.used = 0
+        self.keys = set()
+
+
+class Prefetcher:
+    """Runs speculative generations for sessions on a small shared executor"""
+
+    def __init__(self, max_workers=1, budget=3, idle_seconds=300):
+        self.budget = budget
+        self.idle_seconds = idle_seconds
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="lexify-prefetch")
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self._counters = {
+            "started": 0,
+            "completed": 0,
+            "failed": 0,
+            "discarded": 0,
+            "over_budget": 0,
+        }
+
+    def touch(self, session_id):
+        """Record activity from a session"""
+        with self._lock:
+            self._session(session_id).last_seen = time.time()
+
+    def request(self, session_id, key, fn, *args, **kwargs):
+        """Queue fn(*args, **kwargs) -> (questions, error) once per key and session
+
+        Keys are remembered for SESSION_RETENTION_SECONDS, so they should be small
+        (hash large inputs). Returns False when the key was already requested or
+        the session's budget is spent.
+        """
+        with self._lock:
+            self._prune()
+            session = self._session(session_id)
+            session.last_seen = time.time()
+            if key in session.keys:
+                return False
+            if session.used >= self.budget:
+                self._counters["over_budget"] += 1
+                return False
+            session.keys.add(key)
+            session.used += 1
+            self._counters["started"] += 1
+        self._executor.submit(self._run, session_id, fn, args, kwargs)
+        return True
+
+    def is_idle(self, session_id):
+        """True when the session has not been seen within the idle timeout"""
+        with self._lock:
+            session = self._sessions.get(session_id)
+            return session is None or time.time() - session.last_seen > self.idle_seconds
+
+    def _run(self, session_id, fn, args, kwargs):
+        # The session walked away while this waited for a worker; don't spend tokens on it
+        if self.is_idle(session_id):
+            self._count("discarded")
+            return
+        try:
+            questions, error = fn(*args, **kwargs)
+        except Exception:
+            questions, error = None, "prefetch failed"
+        self._count("completed" if questions and not error else "failed")
+
+    def _session(self, session_id):
+        session = self._sessions.get(session_id)
+        if session is None:
+            session = self._sessions[session_id] = _Session()
+        return session
+
+    def _prune(self):
+        cutoff = time.time() - SESSION_RETENTION_SECONDS
+        for session_id in [session_id for session_id, session in self._sessions.items()
+                           if session.last_seen < cutoff]:
+            del self._sessions[session_id]
+
+    def _count(self, name):
+        with self._lock:
+            self._counters[name] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats["sessions"] = len(self._sessions)
+        return stats
+
+
+def create_prefetcher_from_env():
+    """Build the Prefetcher from LEXIFY_PREFETCH* settings (None unless LEXIFY_PREFETCH=1)"""
+    if os.getenv("LEXIFY_PREFETCH", "0") != "1":
+        return None
+    return Prefetcher(
+        max_workers=int(os.getenv("LEXIFY_PREFETCH_WORKERS", "1")),
+        budget=int(os.getenv("LEXIFY_PREFETCH_BUDGET", "3")),
+        idle_seconds=float(os.getenv("LEXIFY_PREFETCH_IDLE_SECONDS", "300")),
+    )
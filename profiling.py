@@ -0,0 +1,219 @@
+"""Phase timing for reruns and generation calls, with opt-in profiling.
+
+Every traced block (a script rerun, a fragment rerun, a generation call)
+records named phase durations and, when LEXIFY_TIMING_LOG is set, appends one
+JSON line per block to that file. LEXIFY_PROFILE=cprofile or sample additionally
+captures a profile of top-level traced blocks into LEXIFY_PROFILE_DIR:
+cProfile .prof files for pstats/snakeviz, or collapsed stacks from a wall-clock
+sampler for flame graph tools.
+"""
+
+import contextvars
+import cProfile
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+
+TIMING_LOG = os.getenv("LEXIFY_TIMING_LOG", "")
+PROFILE_MODE = os.getenv("LEXIFY_PROFILE", "").lower()
+PROFILE_DIR = os.getenv("LEXIFY_PROFILE_DIR", ".lexify_profiles")
+# Profile one in every N top-level blocks
+PROFILE_EVERY = max(1, int(os.getenv("LEXIFY_PROFILE_EVERY", "1")))
+PROFILE_INTERVAL = float(os.getenv("LEXIFY_PROFILE_INTERVAL", "0.005"))
+
+_current = contextvars.ContextVar("lexify_trace", default=None)
+_log_lock = threading.Lock()
+_profile_lock = threading.Lock()
+_profile_counter = 0
+
+
+class Trace:
+    """Phase durations of one traced block"""
+
+    def __init__(self, kind, parent=None, **fields):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.parent = parent
+        self.fields = fields
+        self.phases = {}
+        self.started = time.perf_counter()
+        self._mark = self.started
+        self._lock = threading.Lock()
+
+    def add(self, name, seconds):
+        """Add time to a phase; phases run by several workers accumulate"""
+        with self._lock:
+            total, count = self.phases.get(name, (0.0, 0))
+            self.phases[name] = (total + seconds, count + 1)
+
+    def checkpoint(self, name):
+        """Attribute the time since the previous checkpoint to a phase"""
+        now = time.perf_counter()
+        self.add(name, now - self._mark)
+        self._mark = now
+
+    def record(self):
+        """The trace as a JSON-serializable dict"""
+        with self._lock:
+            phases = {name: round(total * 1000, 3) for name, (total, _) in self.phases.items()}
+            counts = {name: count for name, (_, count) in self.phases.items() if count > 1}
+        record = {
+            "ts": datetime.now().isoformat(timespec="milliseconds"),
+            "id": self.id,
+            "kind": self.kind,
+            "parent": self.parent.id if self.parent else None,
+            "total_ms": round((time.perf_counter() - self.started) * 1000, 3),
+            "phases_ms": phases,
+        }
+        if counts:
+            record["phase_counts"] = counts
+        record.update(self.fields)
+        return record
+
+
+def current_trace():
+    """The innermost active trace in this context, or None"""
+    return _current.get()
+
+
+def annotate(**fields):
+    """Attach fields (e.g. the cache outcome) to the current trace"""
+    trace = _current.get()
+    if trace is not None:
+        trace.fields.update(fields)
+
+
+def checkpoint(name):
+    """Attribute the time since the previous checkpoint of the current trace to name"""
+    trace = _current.get()
+    if trace is not None:
+        trace.checkpoint(name)
+
+
+@contextmanager
+def phase(name, trace=None):
+    """Time a block as a phase of trace (default: the current trace)
+
+    Pass the trace explicitly when the block runs on a worker thread that does
+    not share the caller's context.
+    """
+    trace = trace or _current.get()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        if trace is not None:
+            trace.add(name, time.perf_counter() - started)
+
+
+def _write(record):
+    try:
+        with _log_lock, open(TIMING_LOG, "a", encoding="utf-8") as handle:
+            handle.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+    except OSError:
+        # Timing must never break the app
+        pass
+
+
+def _should_profile():
+    global _profile_counter
+    if PROFILE_MODE not in ("cprofile", "sample"):
+        return False
+    with _profile_lock:
+        _profile_counter += 1
+        return _profile_counter % PROFILE_EVERY == 0
+
+
+def _profile_path(trace, extension):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    name = trace.kind.replace(":", "-")
+    return os.path.join(PROFILE_DIR, f"{stamp}-{name}-{trace.id}.{extension}")
+
+
+class StackSampler:
+    """Wall-clock sampler of one thread's stack, written as collapsed stacks"""
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="lexify-sampler", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def write(self, path):
+        with open(path, "w", encoding="utf-8") as handle:
+            for stack, count in self.stacks.most_common():
+                handle.write(f"{stack} {count}\n")
+
+
+@contextmanager
+def traced(kind, **fields):
+    """Trace a block (also usable as a decorator); nested blocks get their own record"""
+    parent = _current.get()
+    trace = Trace(kind, parent, **fields)
+    token = _current.set(trace)
+
+    profiler = sampler = None
+    if parent is None and _should_profile():
+        if PROFILE_MODE == "cprofile":
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:
+                # Another profiler is already active on this interpreter
+                profiler = None
+        else:
+            sampler = StackSampler(threading.get_ident(), PROFILE_INTERVAL)
+            sampler.start()
+
+    try:
+        yield trace
+    except BaseException as e:
+        # Includes Streamlit's rerun/stop control flow, which ends a rerun early
+        trace.fields["exit"] = type(e).__name__
+        raise
+    finally:
+        _current.reset(token)
+        record = None
+        if profiler is not None:
+            profiler.disable()
+            record = trace.record()
+            record["profile"] = _profile_path(trace, "prof")
+            profiler.dump_stats(record["profile"])
+        elif sampler is not None:
+            sampler.stop()
+            record = trace.record()
+            record["profile"] = _profile_path(trace, "collapsed")
+            sampler.write(record["profile"])
+        if TIMING_LOG:
+            _write(record or trace.record())
+
+
+def submit_in_context(executor, fn, *args):
+    """executor.submit that keeps the caller's active trace visible in the worker"""
+    return executor.submit(contextvars.copy_context().run, fn, *args)
@@ -0,0 +1,201 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from question_cache import normalize_text
+
+
+def content_hash(text_content):
+    """Hash of the normalized source text a question was generated from"""
+    return hashlib.sha256(normalize_text(text_content).encode("utf-8")).hexdigest()
+
+
+def question_hash(question):
+    """Hash identifying a question independent of option order or whitespace"""
+    material = json.dumps([
+        normalize_text(question["mcq"]).lower(),
+        sorted(normalize_text(option).lower() for option in question["options"].values()),
+    ], ensure_ascii=False)
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+def derive_topic(text_content, max_length=80):
+    """Use the first non-empty line of a document as its topic"""
+    for line in text_content.splitlines():
+        line = line.strip().lstrip("#").strip()
+        if line:
+            return line[:max_length]
+    return ""
+
+
+def normalize_topic(topic):
+    """Topic as compared for reuse: case and whitespace are ignored, nothing else"""
+    return normalize_text(topic or "").lower()
+
+
+def _phrase(text):
+    """Quote text as an FTS5 phrase so user input cannot inject query syntax"""
+    return '"' + text.replace('"', '""') + '"'
+
+
+class QuestionBank:
+    """Persistent, indexed store of every validated question
+
+    Questions are keyed by the source content hash and level, so a quiz for
+    content that was seen before can be assembled without calling the model.
+    Short topic inputs reuse questions banked under exactly the same topic. An
+    FTS5 index over question text, topic, content hash and level supports search.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.fts = True
+        self._local = threading.local()
+        self._init_db()
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA busy_timeout = 30000")
+            conn.execute("PRAGMA synchronous = NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _init_db(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        conn = self._connect()
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS questions (
+                id INTEGER PRIMARY KEY,
+                question_hash TEXT NOT NULL,
+                content_hash TEXT NOT NULL,
+                topic TEXT NOT NULL,
+                topic_norm TEXT NOT NULL DEFAULT '',
+                level TEXT NOT NULL,
+                model TEXT NOT NULL,
+                mcq TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                UNIQUE (content_hash, level, model, question_hash)
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_questions_lookup ON questions (content_hash, level, model)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_questions_topic ON questions (topic_norm, level, model)")
+        try:
+            conn.execute("""
+                CREATE VIRTUAL TABLE IF NOT EXISTS question_search USING fts5(
+                    mcq, topic, content_hash, level,
+                    content='questions', content_rowid='id'
+                )
+            """)
+            conn.execute("""
+                CREATE TRIGGER IF NOT EXISTS questions_search_insert AFTER INSERT ON questions BEGIN
+                    INSERT INTO question_search (rowid, mcq, topic, content_hash, level)
+                    VALUES (new.id, new.mcq, new.topic, new.content_hash, new.level);
+                END
+            """)
+            conn.execute("""
+                CREATE TRIGGER IF NOT EXISTS questions_search_delete AFTER DELETE ON questions BEGIN
+                    INSERT INTO question_search (question_search, rowid, mcq, topic, content_hash, level)
+                    VALUES ('delete', old.id, old.mcq, old.topic, old.content_hash, old.level);
+                END
+            """)
+        except sqlite3.OperationalError:
+            # SQLite built without FTS5: exact content lookups still work
+            self.fts = False
+
+    def add_questions(self, source_hash, topic, level, model_name, questions, derived_topic=False):
+        """Store validated questions, ignoring ones already in the bank; returns the number added
+
+        A derived_topic (a document's first line, from derive_topic) is stored for
+        search only: those questions are never reused for a short input that happens
+        to equal the document's first line.
+        """
+        now = time.time()
+        topic_norm = "" if derived_topic else normalize_topic(topic)
+        rows = [
+            (question_hash(question), source_hash, topic or "", topic_norm, level.lower(), model_name,
+             question["mcq"], json.dumps(question, ensure_ascii=False), now)
+            for question in questions
+        ]
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # rowcount, unlike total_changes, leaves out the rows the search-index triggers write
+            added = conn.executemany(
+                "INSERT OR IGNORE INTO questions "
+                "(question_hash, content_hash, topic, topic_norm, level, model, mcq, payload, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            ).rowcount
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return added
+
+    def count(self, source_hash, level, model_name):
+        """Number of banked questions for a source, level and model"""
+        return self._connect().execute(
+            "SELECT COUNT(*) FROM questions WHERE content_hash = ? AND level = ? AND model = ?",
+            (source_hash, level.lower(), model_name),
+        ).fetchone()[0]
+
+    def assemble_quiz(self, source_hash, level, model_name, num_questions, topic=None):
+        """Draw a random quiz from banked questions, or return None if there are too few
+
+        Questions generated from the same content are preferred; for short topic
+        inputs, questions banked under the same explicit topic (ignoring case and
+        spacing) are used as well. A topic that merely contains the words ("cell" in
+        "Hydrogen fuel cell vehicles") does not match. A question banked from several
+        inputs on one topic is drawn at most once.
+        """
+        conn = self._connect()
+        rows = conn.execute(
+            "SELECT payload FROM questions WHERE content_hash = ? AND level = ? AND model = ? "
+            "ORDER BY random() LIMIT ?",
+            (source_hash, level.lower(), model_name, num_questions),
+        ).fetchall()
+
+        if len(rows) < num_questions and normalize_topic(topic):
+            rows = conn.execute(
+                "SELECT payload FROM questions WHERE topic_norm = ? AND level = ? AND model = ? "
+                "GROUP BY question_hash ORDER BY random() LIMIT ?",
+                (normalize_topic(topic), level.lower(), model_name, num_questions),
+            ).fetchall()
+
+        if len(rows) < num_questions:
+            return None
+        return [json.loads(payload) for (payload,) in rows]
+
+    def search(self, query, level=None, limit=20):
+        """Full-text search over banked questions, best matches first"""
+        if not self.fts:
+            return []
+        sql = (
+            "SELECT q.payload, q.topic, q.level FROM question_search s JOIN questions q ON q.id = s.rowid "
+            "WHERE question_search MATCH ?"
+        )
+        params = [_phrase(query)]
+        if level:
+            sql += " AND q.level = ?"
+            params.append(level.lower())
+        sql += " ORDER BY bm25(question_search) LIMIT ?"
+        params.append(limit)
+        return [
+            {"question": json.loads(payload), "topic": topic, "level": row_level}
+            for payload, topic, row_level in self._connect().execute(sql, params)
+        ]
+
+
+def create_bank_from_env():
+    """Build the QuestionBank at LEXIFY_BANK_PATH, or None when it is disabled"""
+    path = os.getenv("LEXIFY_BANK_PATH", ".lexify_cache/bank.sqlite3")
+    if path.lower() in ("", "none", "off"):
+        return None
+    return QuestionBank(path)
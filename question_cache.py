@@ -0,0 +1,249 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+def normalize_text(text):
+    """Collapse whitespace so cosmetic differences map to the same cache key"""
+    return " ".join(text.split())
+
+
+def make_cache_key(text_content, quiz_level, num_questions, model_name, prompt_version, variant=0):
+    """Build a stable hash for one generation request
+
+    variant numbers alternate quizzes for the same request; variant 0 keeps the
+    original key so existing cache entries stay valid.
+    """
+    parts = [
+        normalize_text(text_content),
+        str(quiz_level).strip().lower(),
+        int(num_questions),
+        model_name,
+        prompt_version,
+    ]
+    if variant:
+        parts.append(int(variant))
+    payload = json.dumps(parts, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class QuestionCache:
+    """Two-tier cache: an in-process LRU in front of a shared SQLite store.
+
+    The SQLite file runs in WAL mode so several Streamlit worker processes can
+    read and write it at the same time. Values must be JSON serializable.
+    """
+
+    def __init__(self, path, ttl_seconds=7 * 24 * 3600, max_memory_items=256,
+                 max_memory_bytes=16 * 1024 * 1024, max_disk_bytes=512 * 1024 * 1024):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_memory_items = max_memory_items
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+
+        self._memory = OrderedDict()  # key -> (expires_at, size, value)
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._counters = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "sets": 0,
+            "memory_evictions": 0,
+            "disk_evictions": 0,
+            "expired": 0,
+        }
+
+        if path:
+            self._init_db()
+
+    # SQLite tier
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA busy_timeout = 30000")
+            conn.execute("PRAGMA synchronous = NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _init_db(self):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        conn = self._connect()
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS question_cache (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                expires_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_question_cache_accessed ON question_cache (accessed_at)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_question_cache_expires ON question_cache (expires_at)")
+
+    def _disk_get(self, key, now):
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT value, expires_at FROM question_cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        value, expires_at = row
+        if expires_at <= now:
+            conn.execute("DELETE FROM question_cache WHERE key = ? AND expires_at <= ?", (key, now))
+            self._count("expired")
+            return None
+        conn.execute("UPDATE question_cache SET accessed_at = ? WHERE key = ?", (now, key))
+        return value, expires_at
+
+    def _disk_set(self, key, encoded, now, expires_at):
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO question_cache (key, value, size, created_at, expires_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, encoded, len(encoded), now, expires_at, now),
+            )
+            self._disk_evict(conn, now)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _disk_evict(self, conn, now):
+        removed = conn.execute("DELETE FROM question_cache WHERE expires_at <= ?", (now,)).rowcount
+        if removed > 0:
+            self._count("expired", removed)
+
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM question_cache").fetchone()[0]
+        if total <= self.max_disk_bytes:
+            return
+
+        # Drop least recently used rows until the store fits its budget again
+        excess = total - self.max_disk_bytes
+        victims = []
+        for key, size in conn.execute("SELECT key, size FROM question_cache ORDER BY accessed_at"):
+            victims.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        conn.executemany("DELETE FROM question_cache WHERE key = ?", victims)
+        self._count("disk_evictions", len(victims))
+
+    # Memory tier
+
+    def _memory_get(self, key, now):
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                return None
+            expires_at, size, value = entry
+            if expires_at <= now:
+                del self._memory[key]
+                self._memory_bytes -= size
+                self._counters["expired"] += 1
+                return None
+            self._memory.move_to_end(key)
+            return value
+
+    def _memory_set(self, key, value, size, expires_at):
+        if size > self.max_memory_bytes:
+            return
+        with self._lock:
+            old = self._memory.pop(key, None)
+            if old is not None:
+                self._memory_bytes -= old[1]
+            self._memory[key] = (expires_at, size, value)
+            self._memory_bytes += size
+            while self._memory and (len(self._memory) > self.max_memory_items
+                                    or self._memory_bytes > self.max_memory_bytes):
+                _, (_, evicted_size, _) = self._memory.popitem(last=False)
+                self._memory_bytes -= evicted_size
+                self._counters["memory_evictions"] += 1
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._counters[name] += amount
+
+    # Public API
+
+    def get(self, key, count=True):
+        """Return the cached value for key, or None on a miss
+
+        count=False leaves the hit and miss counters alone, for polling.
+        """
+        now = time.time()
+        value = self._memory_get(key, now)
+        if value is not None:
+            if count:
+                self._count("memory_hits")
+            return json.loads(value)
+
+        if self.path:
+            try:
+                row = self._disk_get(key, now)
+            except sqlite3.Error:
+                row = None
+            if row is not None:
+                encoded, expires_at = row
+                self._memory_set(key, encoded, len(encoded), expires_at)
+                if count:
+                    self._count("disk_hits")
+                return json.loads(encoded)
+
+        if count:
+            self._count("misses")
+        return None
+
+    def set(self, key, value, ttl_seconds=None):
+        """Store value under key in both tiers"""
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        now = time.time()
+        expires_at = now + ttl
+        encoded = json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+        self._memory_set(key, encoded, len(encoded), expires_at)
+        if self.path:
+            try:
+                self._disk_set(key, encoded, now, expires_at)
+            except sqlite3.Error:
+                # The disk tier is best effort; the memory tier still serves this process
+                pass
+        self._count("sets")
+
+    def stats(self):
+        """Return hit/miss counters and current tier sizes"""
+        with self._lock:
+            stats = dict(self._counters)
+            stats["memory_items"] = len(self._memory)
+            stats["memory_bytes"] = self._memory_bytes
+        stats["hits"] = stats["memory_hits"] + stats["disk_hits"]
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+
+def create_cache_from_env():
+    """Build a QuestionCache configured from LEXIFY_CACHE_* environment variables"""
+    path = os.getenv("LEXIFY_CACHE_PATH", ".lexify_cache/questions.sqlite3")
+    if path.lower() in ("", "none", "off"):
+        path = None
+    return QuestionCache(
+        path,
+        ttl_seconds=float(os.getenv("LEXIFY_CACHE_TTL_SECONDS", 7 * 24 * 3600)),
+        max_memory_items=int(os.getenv("LEXIFY_CACHE_MEMORY_ITEMS", 256)),
+        max_memory_bytes=int(os.getenv("LEXIFY_CACHE_MEMORY_BYTES", 16 * 1024 * 1024)),
+        max_disk_bytes=int(os.getenv("LEXIFY_CACHE_DISK_BYTES", 512 * 1024 * 1024)),
+    )
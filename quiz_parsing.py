@@ -0,0 +1,247 @@
+import json
+import re
+
+OPTION_KEYS = ("a", "b", "c", "d")
+
+# A complete JSON string (unrolled loop, so each character is visited once) or a lone
+# quote when the string is not terminated yet, plus the structural characters we track
+_STREAM_TOKEN = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*"|"|[{}\[\]:,]')
+_OBJECT_TOKEN = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*"|[{}]')
+_MEMBER_COLON = re.compile(r"\s*:")
+_DECODER = json.JSONDecoder()
+_CORRECT_LETTER = re.compile(r"^\W*(?:option|answer)?\s*\W*([a-d])\b", re.IGNORECASE)
+# The fallback scan decodes at most this many times the reply's length in total
+SCAN_DECODE_BUDGET = 4
+# json raises RecursionError, not JSONDecodeError, on deeply nested input
+_DECODE_ERRORS = (ValueError, RecursionError)
+
+
+def validate_question(question):
+    """Return a normalized copy of a question, or None if its shape is invalid
+
+    A valid question has non-empty text, exactly four distinct options keyed a-d
+    and a correct answer that names one of those keys.
+    """
+    if not isinstance(question, dict):
+        return None
+
+    text = question.get("mcq")
+    if not isinstance(text, str) or not text.strip():
+        return None
+
+    options = question.get("options")
+    if isinstance(options, list) and len(options) == 4:
+        options = dict(zip(OPTION_KEYS, options))
+    if not isinstance(options, dict):
+        return None
+    options = {str(key).strip().lower(): value for key, value in options.items()}
+    if sorted(options) != list(OPTION_KEYS):
+        return None
+    if any(not isinstance(value, (str, int, float)) or not str(value).strip() for value in options.values()):
+        return None
+    options = {key: str(options[key]).strip() for key in OPTION_KEYS}
+    if len(set(options.values())) != 4:
+        return None
+
+    correct = question.get("correct")
+    if not isinstance(correct, str):
+        return None
+    correct = correct.strip()
+    if correct.lower() in OPTION_KEYS:
+        correct = correct.lower()
+    else:
+        # Some replies name the answer text or prefix the letter, e.g. "b) Paris"
+        by_text = next((key for key, value in options.items() if value == correct), None)
+        match = _CORRECT_LETTER.match(correct)
+        if by_text is None and match is None:
+            return None
+        correct = by_text or match.group(1).lower()
+
+    normalized = {"mcq": text.strip(), "options": options, "correct": correct}
+    explanation = question.get("explanation")
+    if isinstance(explanation, str) and explanation.strip():
+        normalized["explanation"] = explanation.strip()
+    return normalized
+
+
+def validate_questions(questions):
+    """Normalize a list of questions, dropping the invalid ones"""
+    if not isinstance(questions, list):
+        return []
+    return [valid for valid in map(validate_question, questions) if valid is not None]
+
+
+def _questions_from(candidate, key):
+    if isinstance(candidate, dict) and key in candidate:
+        return validate_questions(candidate[key])
+    return []
+
+
+def _decode_near_key(text, key_token, attempts=8):
+    """Try raw_decode from the brace opening each of the first few key occurrences"""
+    at = text.find(key_token)
+    while at != -1 and attempts > 0:
+        start = text.rfind("{", 0, at)
+        if start != -1:
+            try:
+                candidate, _ = _DECODER.raw_decode(text, start)
+            except _DECODE_ERRORS:
+                candidate = None
+            questions = _questions_from(candidate, key_token[1:-1])
+            if questions:
+                return questions
+        attempts -= 1
+        at = text.find(key_token, at + 1)
+    return None
+
+
+def extract_mcqs(text, key="mcqs"):
+    """Find the first object with a non-empty, valid mcqs list in a model reply
+
+    Handles bare JSON, fenced code blocks and JSON surrounded by prose. After two
+    cheap attempts (the whole reply, then the object around the key) it falls back
+    to a single left-to-right scan: strings are skipped whole, balanced {...} spans
+    are tracked with a stack and only objects that have the key as a member are
+    decoded. Decoding in the scan is capped at SCAN_DECODE_BUDGET times the length
+    of the reply, so nested objects that each hold the key cannot make it quadratic.
+    """
+    if not text:
+        return None
+
+    try:
+        questions = _questions_from(json.loads(text), key)
+        if questions:
+            return questions
+    except _DECODE_ERRORS:
+        pass
+
+    key_token = json.dumps(key)
+    questions = _decode_near_key(text, key_token)
+    if questions:
+        return questions
+
+    budget = SCAN_DECODE_BUDGET * len(text)
+    stack = []  # [start of an open object, whether the key is one of its members]
+    position = text.find("{")
+    while position != -1:
+        if not stack:
+            position = text.find("{", position)
+            if position == -1:
+                break
+            stack.append([position, False])
+            position += 1
+            continue
+
+        match = _OBJECT_TOKEN.search(text, position)
+        if match is None:
+            break
+        token = match.group()
+        position = match.end()
+
+        if token == "{":
+            stack.append([match.start(), False])
+        elif token == "}":
+            start, has_key = stack.pop()
+            # Spans too large for what is left of the budget are skipped, not the rest of the reply
+            if has_key and position - start <= budget:
+                budget -= position - start
+                try:
+                    candidate = json.loads(text[start:position])
+                except _DECODE_ERRORS:
+                    continue
+                questions = _questions_from(candidate, key)
+                if questions:
+                    return questions
+        elif token == key_token and _MEMBER_COLON.match(text, position):
+            stack[-1][1] = True
+
+    return None
+
+
+class MCQStreamParser:
+    """Incrementally parse a streamed {"mcqs": [...]} document.
+
+    Feed text chunks as they arrive; each call returns the question objects
+    whose closing brace has been seen so far, so callers can show question 1
+    while the rest of the reply is still being generated.
+    """
+
+    def __init__(self, key="mcqs"):
+        self.key = key
+        self.count = 0
+        self._chunks = []
+        # Text not yet consumed: the open question object or a token split across chunks.
+        # _pos and _object_start are offsets into it.
+        self._window = ""
+        self._pos = 0
+        self._depth = 0
+        self._last_string = None
+        self._pending_key = None
+        self._array_depth = None
+        self._object_start = None
+        self._finished = False
+
+    @property
+    def text(self):
+        """Everything received so far"""
+        if len(self._chunks) > 1:
+            self._chunks = ["".join(self._chunks)]
+        return self._chunks[0] if self._chunks else ""
+
+    def feed(self, chunk):
+        """Consume a chunk of text and return the questions it completed"""
+        if not chunk:
+            return []
+        self._chunks.append(chunk)
+        if self._finished:
+            return []
+        # Scanned text is dropped, so each chunk costs its own length plus the open object
+        consumed = self._pos if self._object_start is None else self._object_start
+        text = self._window[consumed:] + chunk
+        if self._object_start is not None:
+            self._object_start -= consumed
+        completed = []
+
+        position = self._pos - consumed
+        while not self._finished:
+            match = _STREAM_TOKEN.search(text, position)
+            if match is None:
+                position = len(text)
+                break
+            token = match.group()
+            if token == '"':
+                # Unterminated string: wait for the next chunk
+                position = match.start()
+                break
+            position = match.end()
+
+            if token[0] == '"':
+                if self._object_start is None:
+                    self._last_string = token[1:-1]
+            elif token == ":":
+                self._pending_key = self._last_string
+            elif token == ",":
+                self._pending_key = None
+            elif token in "{[":
+                if token == "[" and self._array_depth is None and self._pending_key == self.key:
+                    self._array_depth = self._depth + 1
+                elif token == "{" and self._array_depth is not None and self._depth == self._array_depth:
+                    self._object_start = match.start()
+                self._depth += 1
+                self._pending_key = None
+            else:
+                self._depth -= 1
+                if self._array_depth is not None:
+                    if token == "}" and self._object_start is not None and self._depth == self._array_depth:
+                        try:
+                            completed.append(json.loads(text[self._object_start:position]))
+                        except _DECODE_ERRORS:
+                            pass
+                        self._object_start = None
+                    elif token == "]" and self._depth < self._array_depth:
+                        self._finished = True
+
+        self._window = text
+        self._pos = position
+        self.count += len(completed)
+        return completed
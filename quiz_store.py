@@ -0,0 +1,93 @@
+"""Shared, immutable quiz storage.
+
+Quizzes are interned by content: every session taking the same quiz refers to
+one Quiz object by its ID, and keeps only that ID and an array of selected
+option indices in its own state.
+"""
+
+import hashlib
+import json
+import threading
+from array import array
+from collections import OrderedDict
+
+from grading import UNANSWERED, AnswerKey
+
+
+def quiz_id(questions):
+    """Content hash identifying a quiz"""
+    material = json.dumps(questions, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()[:16]
+
+
+class Question:
+    """One immutable question; correct is the index of the right option"""
+
+    __slots__ = ("mcq", "options", "correct", "explanation")
+
+    def __init__(self, mcq, options, correct, explanation):
+        self.mcq = mcq
+        self.options = options
+        self.correct = correct
+        self.explanation = explanation
+
+
+class Quiz:
+    """An interned quiz with its compiled answer key"""
+
+    __slots__ = ("quiz_id", "questions", "key")
+
+    def __init__(self, questions, identifier=None):
+        self.quiz_id = identifier or quiz_id(questions)
+        self.key = AnswerKey(questions)
+        self.questions = tuple(
+            Question(
+                question["mcq"],
+                tuple(question["options"][option_key] for option_key in option_keys),
+                int(correct),
+                question.get("explanation", ""),
+            )
+            for question, option_keys, correct in zip(questions, self.key.option_keys, self.key.correct)
+        )
+
+    def __len__(self):
+        return len(self.questions)
+
+    def new_answers(self):
+        """A blank answer sheet: one signed byte per question"""
+        return array("b", [UNANSWERED]) * len(self.questions)
+
+
+class QuizStore:
+    """Process-wide store of quizzes by ID, evicting the least recently used"""
+
+    def __init__(self, max_quizzes=2048):
+        self.max_quizzes = max_quizzes
+        self._quizzes = OrderedDict()
+        self._lock = threading.Lock()
+
+    def intern(self, questions):
+        """Return the stored Quiz for these questions, adding it if needed"""
+        identifier = quiz_id(questions)
+        quiz = self.get(identifier)
+        if quiz is not None:
+            return quiz
+        candidate = Quiz(questions, identifier)
+        with self._lock:
+            # Another session may have interned the same quiz meanwhile
+            quiz = self._quizzes.setdefault(identifier, candidate)
+            while len(self._quizzes) > self.max_quizzes:
+                self._quizzes.popitem(last=False)
+            return quiz
+
+    def get(self, quiz_id):
+        """The Quiz with this ID, or None if it was never stored or has been evicted"""
+        with self._lock:
+            quiz = self._quizzes.get(quiz_id)
+            if quiz is not None:
+                self._quizzes.move_to_end(quiz_id)
+            return quiz
+
+    def __len__(self):
+        with self._lock:
+            return len(self._quizzes)
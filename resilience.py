@@ -0,0 +1,247 @@
+"""Deadlines, retries and hedging for model calls.
+
+A ResiliencePolicy runs each call on a worker thread so it can give up after a
+deadline, retries transient failures with exponential backoff and full jitter,
+and, once it has seen enough calls to know the latency distribution, sends a
+duplicate "hedge" request when a call runs past the configured percentile and
+keeps whichever reply arrives first.
+"""
+
+import os
+import queue
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# Exception class names (anywhere in the MRO) worth retrying. Matching by name
+# covers google.api_core errors without importing the Gemini SDK here.
+TRANSIENT_ERRORS = {
+    "TimeoutError", "ConnectionError", "CallTimeout", "ReplyParseError", "BackendError",
+    "ResourceExhausted", "TooManyRequests", "ServiceUnavailable", "DeadlineExceeded",
+    "InternalServerError", "BadGateway", "GatewayTimeout", "RetryError",
+}
+
+_END = object()
+
+
+class CallTimeout(TimeoutError):
+    """Raised when a call does not finish before its deadline"""
+
+
+class ReplyParseError(Exception):
+    """Raised when a reply arrives but contains no usable questions"""
+
+
+def is_transient(error):
+    """Whether an error is worth retrying"""
+    return any(cls.__name__ in TRANSIENT_ERRORS for cls in type(error).__mro__)
+
+
+class LatencyWindow:
+    """Latencies of the most recent successful calls"""
+
+    def __init__(self, size=256):
+        self._lock = threading.Lock()
+        self._samples = deque(maxlen=size)
+
+    def add(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._samples)
+
+    def percentile(self, fraction):
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(fraction * len(samples)))]
+
+
+class ResiliencePolicy:
+    """Run model calls with a deadline, retries and optional hedging
+
+    timeout is the deadline for one attempt; for streams it is the longest gap
+    between chunks, and stream_timeout bounds the whole stream. Hedging is off
+    when hedge_percentile is 0.
+    """
+
+    def __init__(self, timeout=60.0, max_attempts=3, backoff_base=0.5, backoff_max=8.0,
+                 hedge_percentile=0.0, hedge_min_samples=20, max_workers=32, seed=None,
+                 stream_timeout=180.0):
+        self.timeout = timeout
+        self.stream_timeout = stream_timeout
+        self.max_attempts = max(1, max_attempts)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.latencies = LatencyWindow()
+        self._random = random.Random(seed)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="lexify-call")
+        self._lock = threading.Lock()
+        self._counters = {
+            "calls": 0, "attempts": 0, "retries": 0, "timeouts": 0,
+            "hedges": 0, "hedge_wins": 0, "failures": 0,
+        }
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._counters[name] += amount
+
+    def backoff(self, attempt):
+        """Full-jitter exponential backoff before retry number attempt (1-based)"""
+        ceiling = min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1))
+        with self._lock:
+            return self._random.uniform(0, ceiling)
+
+    @property
+    def hedging(self):
+        """Whether calls may be hedged; streams never are"""
+        return self.hedge_percentile > 0
+
+    def hedge_delay(self):
+        """Seconds after which a duplicate request is sent, or None when not hedging"""
+        if not self.hedging or len(self.latencies) < self.hedge_min_samples:
+            return None
+        return self.latencies.percentile(self.hedge_percentile)
+
+    def _timed(self, fn):
+        started = time.monotonic()
+        result = fn()
+        return result, time.monotonic() - started
+
+    def _attempt(self, fn):
+        """One attempt, possibly hedged; returns fn's result or raises"""
+        deadline = time.monotonic() + self.timeout
+        primary = self._executor.submit(self._timed, fn)
+        pending = {primary}
+        errors = []
+
+        delay = self.hedge_delay()
+        if delay is not None and delay < self.timeout:
+            done, _ = wait(pending, timeout=delay)
+            if not done:
+                self._count("hedges")
+                pending.add(self._executor.submit(self._timed, fn))
+
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    result, elapsed = future.result()
+                except Exception as e:
+                    errors.append(e)
+                    continue
+                self.latencies.add(elapsed)
+                if future is not primary:
+                    self._count("hedge_wins")
+                # A slower duplicate still running is simply abandoned
+                return result
+
+        if errors and not pending:
+            raise errors[0]
+        self._count("timeouts")
+        raise CallTimeout(f"No reply within {self.timeout:g}s")
+
+    def call(self, fn):
+        """Run fn() under the policy and return its result, or raise the last error"""
+        self._count("calls")
+        for attempt in range(1, self.max_attempts + 1):
+            self._count("attempts")
+            try:
+                return self._attempt(fn)
+            except Exception as e:
+                if attempt == self.max_attempts or not is_transient(e):
+                    self._count("failures")
+                    raise
+            self._count("retries")
+            time.sleep(self.backoff(attempt))
+
+    def stream(self, open_stream):
+        """Yield chunks from open_stream() under the policy
+
+        Failures before the first chunk are retried like call(). Once chunks
+        have been handed out the stream cannot be replayed, so later errors are
+        raised, including CallTimeout when the whole stream runs past
+        stream_timeout. Streams are not hedged.
+        """
+        self._count("calls")
+        for attempt in range(1, self.max_attempts + 1):
+            self._count("attempts")
+            chunks = queue.Queue()
+            cancelled = threading.Event()
+
+            def pump():
+                try:
+                    for chunk in open_stream():
+                        if cancelled.is_set():
+                            return
+                        chunks.put((chunk, None))
+                    chunks.put((_END, None))
+                except Exception as e:
+                    chunks.put((None, e))
+
+            started = time.monotonic()
+            deadline = started + self.stream_timeout
+            self._executor.submit(pump)
+            yielded = False
+            try:
+                while True:
+                    # A reply that keeps trickling in is abandoned at the stream deadline too
+                    remaining = deadline - time.monotonic()
+                    try:
+                        if remaining <= 0:
+                            raise queue.Empty
+                        chunk, error = chunks.get(timeout=min(self.timeout, remaining))
+                    except queue.Empty:
+                        self._count("timeouts")
+                        if remaining < self.timeout:
+                            raise CallTimeout(f"Streamed reply not finished within {self.stream_timeout:g}s") from None
+                        raise CallTimeout(f"No streamed reply within {self.timeout:g}s") from None
+                    if error is not None:
+                        raise error
+                    if chunk is _END:
+                        self.latencies.add(time.monotonic() - started)
+                        return
+                    yielded = True
+                    yield chunk
+            except GeneratorExit:
+                cancelled.set()
+                raise
+            except Exception as e:
+                cancelled.set()
+                if yielded or attempt == self.max_attempts or not is_transient(e):
+                    self._count("failures")
+                    raise
+            self._count("retries")
+            time.sleep(self.backoff(attempt))
+
+    def stats(self):
+        """Counters and recent latency percentiles"""
+        with self._lock:
+            stats = dict(self._counters)
+        stats["p50_s"] = self.latencies.percentile(0.50)
+        stats["p95_s"] = self.latencies.percentile(0.95)
+        stats["hedge_delay_s"] = self.hedge_delay()
+        return stats
+
+
+def create_policy_from_env():
+    """Build a ResiliencePolicy from LEXIFY_* environment variables"""
+    return ResiliencePolicy(
+        timeout=float(os.getenv("LEXIFY_CALL_TIMEOUT", "60")),
+        stream_timeout=float(os.getenv("LEXIFY_STREAM_TIMEOUT", "180")),
+        max_attempts=int(os.getenv("LEXIFY_MAX_ATTEMPTS", "3")),
+        backoff_base=float(os.getenv("LEXIFY_BACKOFF_BASE", "0.5")),
+        backoff_max=float(os.getenv("LEXIFY_BACKOFF_MAX", "8")),
+        hedge_percentile=float(os.getenv("LEXIFY_HEDGE_PERCENTILE", "0")),
+        hedge_min_samples=int(os.getenv("LEXIFY_HEDGE_MIN_SAMPLES", "20")),
+    )
@@ -0,0 +1,193 @@
+"""Near-duplicate detection for source texts.
+
+Texts are canonicalized (Unicode-normalized, lowercased, punctuation and
+whitespace collapsed) and reduced to a bottom-k MinHash sketch of their
+character shingles. Two texts whose estimated Jaccard similarity is above the
+threshold are treated as the same source, so a fixed typo or reflowed
+paragraph reuses the quiz generated for the original.
+"""
+
+import hashlib
+import heapq
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+import zlib
+
+_NON_WORD = re.compile(r"[\W_]+", re.UNICODE)
+
+
+def canonicalize(text):
+    """Normalize text so formatting-only differences disappear"""
+    text = unicodedata.normalize("NFKC", text).lower()
+    return " ".join(_NON_WORD.sub(" ", text).split())
+
+
+def fingerprint(text, shingle_size=5, sketch_size=128):
+    """Bottom-k MinHash sketch: the smallest hashes of the text's character shingles"""
+    canonical = canonicalize(text)
+    if len(canonical) <= shingle_size:
+        shingles = {canonical}
+    else:
+        shingles = {canonical[i:i + shingle_size] for i in range(len(canonical) - shingle_size + 1)}
+    return sorted(heapq.nsmallest(sketch_size, {zlib.crc32(shingle.encode("utf-8")) for shingle in shingles}))
+
+
+def estimate_similarity(sketch_a, sketch_b):
+    """Estimated Jaccard similarity of the shingle sets behind two sketches"""
+    if not sketch_a or not sketch_b:
+        return 0.0
+    size = max(len(sketch_a), len(sketch_b))
+    set_a, set_b = set(sketch_a), set(sketch_b)
+    union = heapq.nsmallest(size, set_a | set_b)
+    return sum(1 for value in union if value in set_a and value in set_b) / len(union)
+
+
+def similarity_scope(quiz_level, num_questions, model_name, prompt_version):
+    """Only quizzes generated with identical settings may be shared"""
+    material = json.dumps([str(quiz_level).strip().lower(), int(num_questions), model_name, prompt_version])
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()[:32]
+
+
+class SimilarityIndex:
+    """Index of source-text sketches, mapping near-identical texts to cache keys
+
+    Every sketch value is indexed, so candidates are found by counting shared
+    values in SQLite and only a handful of sketches are compared in Python.
+    """
+
+    def __init__(self, path, threshold=0.9, sketch_size=128, ttl_seconds=7 * 24 * 3600):
+        self.path = path or ":memory:"
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.sketch_size = sketch_size
+        self.lookups = 0
+        self.hits = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        # An in-memory database is per connection, so it has to be shared
+        self._shared = None if path else sqlite3.connect(":memory:", check_same_thread=False, isolation_level=None)
+        self._init_db()
+
+    def _connect(self):
+        if self._shared is not None:
+            return self._shared
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA busy_timeout = 30000")
+            conn.execute("PRAGMA synchronous = NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _init_db(self):
+        if self._shared is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        conn = self._connect()
+        if self._shared is None:
+            conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS similarity_entries (
+                cache_key TEXT PRIMARY KEY,
+                scope TEXT NOT NULL,
+                sketch TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS similarity_values (
+                scope TEXT NOT NULL,
+                value INTEGER NOT NULL,
+                cache_key TEXT NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_similarity_values ON similarity_values (scope, value)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_similarity_values_key ON similarity_values (cache_key)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_similarity_entries_created ON similarity_entries (created_at)")
+
+    def fingerprint(self, text):
+        return fingerprint(text, sketch_size=self.sketch_size)
+
+    def find(self, sketch, scope):
+        """Return (cache_key, similarity) of the closest indexed text above the threshold, or None"""
+        with self._lock:
+            self.lookups += 1
+        if not sketch:
+            return None
+
+        # Texts with Jaccard similarity J share about 2J/(1+J) of their sketch values;
+        # half the threshold is a safe lower bound for candidates
+        min_shared = max(1, int(len(sketch) * self.threshold / 2))
+        placeholders = ",".join("?" * len(sketch))
+        with self._lock:
+            conn = self._connect()
+            candidates = conn.execute(
+                f"SELECT cache_key, COUNT(*) AS shared FROM similarity_values "
+                f"WHERE scope = ? AND value IN ({placeholders}) "
+                f"GROUP BY cache_key HAVING shared >= ? ORDER BY shared DESC LIMIT 5",
+                [scope, *sketch, min_shared],
+            ).fetchall()
+            sketches = {
+                cache_key: json.loads(stored)
+                for cache_key, stored in conn.execute(
+                    f"SELECT cache_key, sketch FROM similarity_entries WHERE cache_key IN ({','.join('?' * len(candidates))})",
+                    [cache_key for cache_key, _ in candidates],
+                )
+            } if candidates else {}
+
+        best = None
+        for cache_key, stored in sketches.items():
+            score = estimate_similarity(sketch, stored)
+            if score >= self.threshold and (best is None or score > best[1]):
+                best = (cache_key, score)
+        if best:
+            with self._lock:
+                self.hits += 1
+        return best
+
+    def add(self, cache_key, sketch, scope):
+        """Index the sketch of the text a cache entry was generated from"""
+        if not sketch:
+            return
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if conn.execute("SELECT 1 FROM similarity_entries WHERE cache_key = ?", (cache_key,)).fetchone():
+                    conn.execute("COMMIT")
+                    return
+                now = time.time()
+                # Entries outlive their cached quiz only by accident; drop them with it
+                expired = [row[0] for row in conn.execute(
+                    "SELECT cache_key FROM similarity_entries WHERE created_at < ?", (now - self.ttl_seconds,)
+                )]
+                conn.executemany("DELETE FROM similarity_values WHERE cache_key = ?", [(key,) for key in expired])
+                conn.executemany("DELETE FROM similarity_entries WHERE cache_key = ?", [(key,) for key in expired])
+                conn.execute(
+                    "INSERT INTO similarity_entries (cache_key, scope, sketch, created_at) VALUES (?, ?, ?, ?)",
+                    (cache_key, scope, json.dumps(sketch), now),
+                )
+                conn.executemany(
+                    "INSERT INTO similarity_values (scope, value, cache_key) VALUES (?, ?, ?)",
+                    [(scope, value, cache_key) for value in sketch],
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def stats(self):
+        with self._lock:
+            return {"lookups": self.lookups, "hits": self.hits}
+
+
+def create_similarity_index_from_env(path, ttl_seconds):
+    """Build a SimilarityIndex next to the question cache, or None when disabled"""
+    threshold = float(os.getenv("LEXIFY_SIMILARITY_THRESHOLD", "0.9"))
+    if threshold <= 0:
+        return None
+    return SimilarityIndex(path, threshold=threshold, ttl_seconds=ttl_seconds)
@@ -0,0 +1,219 @@
+"""Coalescing of identical in-flight work.
+
+Concurrent callers with the same key share one execution. Within a process,
+followers wait on the leader's call (and can receive its partial results as they
+are published). Across processes, a lease row in SQLite marks the key as in
+flight; other processes poll for the published result instead of starting their
+own, and take over if the lease expires. The leader renews its lease while the
+work runs, so only a process that died or hung loses it.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+
+class _Call:
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.items = []
+        self.done = False
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Run a function at most once per key at a time"""
+
+    def __init__(self, path=None, lease_seconds=120, poll_interval=0.1):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._local = threading.local()
+        self._counters = {"leaders": 0, "followers": 0, "remote_waits": 0, "remote_hits": 0, "takeovers": 0}
+        if path:
+            self._init_db()
+
+    # Cross-process leases
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA busy_timeout = 30000")
+            self._local.conn = conn
+        return conn
+
+    def _init_db(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        conn = self._connect()
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS inflight_leases (
+                key TEXT PRIMARY KEY,
+                owner TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            )
+        """)
+
+    def _acquire(self, key):
+        """Take the lease for key if it is free or expired"""
+        if not self.path:
+            return True
+        now = time.time()
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "INSERT INTO inflight_leases (key, owner, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at "
+                "WHERE inflight_leases.expires_at <= ?",
+                (key, self.owner, now + self.lease_seconds, now),
+            )
+            owner = conn.execute("SELECT owner FROM inflight_leases WHERE key = ?", (key,)).fetchone()[0]
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return owner == self.owner
+
+    def _renew(self, key, stop):
+        """Extend this process's lease on key every third of its length until stop is set"""
+        try:
+            while not stop.wait(self.lease_seconds / 3):
+                try:
+                    self._connect().execute(
+                        "UPDATE inflight_leases SET expires_at = ? WHERE key = ? AND owner = ?",
+                        (time.time() + self.lease_seconds, key, self.owner),
+                    )
+                except sqlite3.Error:
+                    pass
+        finally:
+            conn = getattr(self._local, "conn", None)
+            if conn is not None:
+                conn.close()
+
+    def _release(self, key):
+        if self.path:
+            self._connect().execute("DELETE FROM inflight_leases WHERE key = ? AND owner = ?", (key, self.owner))
+
+    def _count(self, name):
+        with self._lock:
+            self._counters[name] += 1
+
+    def _run_leader(self, key, fn, lookup, publish):
+        try:
+            acquired = self._acquire(key)
+        except sqlite3.Error:
+            # Coordination is an optimisation; never fail the request over it
+            acquired = True
+
+        waited = False
+        while not acquired:
+            if not waited:
+                self._count("remote_waits")
+                waited = True
+            time.sleep(self.poll_interval)
+            result = lookup() if lookup else None
+            if result is not None:
+                self._count("remote_hits")
+                return result
+            try:
+                acquired = self._acquire(key)
+            except sqlite3.Error:
+                acquired = True
+            if acquired:
+                # The other process gave up or its lease expired
+                self._count("takeovers")
+
+        stop = threading.Event()
+        if self.path:
+            threading.Thread(target=self._renew, args=(key, stop), name="lexify-lease", daemon=True).start()
+        try:
+            if waited and lookup:
+                result = lookup()
+                if result is not None:
+                    return result
+            return fn(publish)
+        finally:
+            stop.set()
+            try:
+                self._release(key)
+            except sqlite3.Error:
+                pass
+
+    # Public API
+
+    def do(self, key, fn, lookup=None, on_item=None):
+        """Run fn(publish) once for all concurrent callers with this key and return its result
+
+        publish(item) forwards partial results to followers' on_item callbacks,
+        which run on the followers' own threads. lookup() is polled while another
+        process holds the key and should return its published result, or None.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+                self._counters["leaders"] += 1
+            else:
+                self._counters["followers"] += 1
+
+        if leader:
+            def publish(item):
+                with call.condition:
+                    call.items.append(item)
+                    call.condition.notify_all()
+                if on_item:
+                    on_item(item)
+
+            try:
+                call.result = self._run_leader(key, fn, lookup, publish)
+            except BaseException as e:
+                call.error = e
+                raise
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                with call.condition:
+                    call.done = True
+                    call.condition.notify_all()
+            return call.result
+
+        delivered = 0
+        with call.condition:
+            while True:
+                while on_item and delivered < len(call.items):
+                    item = call.items[delivered]
+                    delivered += 1
+                    # Run the caller's callback without holding the leader up
+                    call.condition.release()
+                    try:
+                        on_item(item)
+                    finally:
+                        call.condition.acquire()
+                if call.done:
+                    break
+                call.condition.wait()
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats["in_flight"] = len(self._calls)
+        return stats
+
+
+def create_single_flight_from_env(path):
+    """Build a SingleFlight whose leases live in the question cache database"""
+    lease_seconds = float(os.getenv("LEXIFY_INFLIGHT_LEASE_SECONDS", "120"))
+    return SingleFlight(path, lease_seconds=lease_seconds)
@@ -0,0 +1,12 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Tests never call a real model or write cache files into the checkout
+os.environ["LEXIFY_BACKEND"] = "stub"
+os.environ["LEXIFY_STUB_LATENCY"] = "0"
+os.environ["LEXIFY_CACHE_PATH"] = "off"
+os.environ["LEXIFY_BANK_PATH"] = "off"
+os.environ["LEXIFY_SIMILARITY_THRESHOLD"] = "0"
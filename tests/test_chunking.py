@@ -0,0 +1,18 @@
+import pytest
+
+from chunking import allocate_questions
+
+
+@pytest.mark.parametrize("chunk_count, num_questions", [(1, 5), (3, 10), (4, 4), (5, 12), (7, 3), (10, 1)])
+def test_allocate_questions_is_even_and_complete(chunk_count, num_questions):
+    quotas = allocate_questions(chunk_count, num_questions)
+    assert len(quotas) == chunk_count
+    assert sum(quotas) == num_questions
+    assert max(quotas) - min(quotas) <= 1
+
+
+def test_allocate_questions_spreads_few_questions_over_the_document():
+    quotas = allocate_questions(10, 3)
+    chosen = [index for index, quota in enumerate(quotas) if quota]
+    assert len(chosen) == 3
+    assert chosen[0] > 0 and chosen[-1] > 5
@@ -0,0 +1,24 @@
+from compaction import compact_text, deduplicate
+
+
+def test_recurring_headings_and_bullets_are_kept():
+    text = ("Python lists\nAdvantages:\n- Mutable\n- Easy to use\n\n"
+            "Python tuples\nAdvantages:\n- Immutable\n- Easy to use\n\n"
+            "Summary\n\nLists change.\n\nSummary\n\nTuples do not.")
+    assert deduplicate(text) == (text, 0, 0)
+
+
+def test_page_headers_and_footers_are_dropped_after_the_first():
+    pages = [f"ACME Handbook\nPage {n} covers a different part of the onboarding process in detail.\nConfidential"
+             for n in range(4)]
+    compacted, paragraphs, lines = deduplicate("\n\n".join(pages))
+    assert (paragraphs, lines) == (0, 6)
+    assert compacted.count("ACME Handbook") == 1 and compacted.count("Confidential") == 1
+    assert all(f"Page {n} covers" in compacted for n in range(4))
+
+
+def test_repeated_paragraphs_are_dropped():
+    paragraph = "Mitochondria produce most of the chemical energy that powers a cell's biochemical reactions."
+    compacted, report = compact_text(f"{paragraph}\n\n\n{paragraph}\n\nRibosomes   make proteins.")
+    assert compacted == f"{paragraph}\n\nRibosomes make proteins."
+    assert report["duplicate_paragraphs"] == 1 and report["tokens_saved"] > 0
@@ -0,0 +1,155 @@
+import pytest
+
+import generation
+
+
+def question(n):
+    return {"mcq": f"Question {n}?", "options": {"a": f"{n}a", "b": f"{n}b", "c": f"{n}c", "d": f"{n}d"},
+            "correct": "a"}
+
+
+def questions(start, count):
+    return [question(n) for n in range(start, start + count)]
+
+
+def plan(*sizes):
+    return [("text", f"prompt {index}", size) for index, size in enumerate(sizes)]
+
+
+@pytest.fixture
+def top_up(monkeypatch):
+    """Replace the top-up request; set .reply to (questions, error) and read .calls"""
+    class TopUp:
+        reply = (None, "top-up failed")
+        calls = 0
+
+    def request_questions(prompt, levels=None):
+        TopUp.calls += 1
+        return TopUp.reply
+
+    monkeypatch.setattr(generation, "request_questions", request_questions)
+    return TopUp
+
+
+@pytest.mark.parametrize("num_questions, batch_size, expected", [
+    (15, 5, [5, 5, 5]), (11, 5, [4, 4, 3]), (3, 5, [3]), (5, 5, [5]), (6, 5, [3, 3]),
+])
+def test_split_batches(num_questions, batch_size, expected):
+    assert generation.split_batches(num_questions, batch_size) == expected
+
+
+class TestQuotaMerger:
+    def test_complete_sub_requests_fill_the_quiz(self, top_up):
+        merger = generation.QuotaMerger(plan(5, 5), 10)
+        merger.add(0, questions(0, 5))
+        merger.add(1, questions(5, 5))
+        result, error = merger.finish("beginner")
+        assert error is None and len(result) == 10
+        assert top_up.calls == 0
+
+    def test_spares_cover_a_failed_sub_request_only_after_quotas(self, top_up):
+        merger = generation.QuotaMerger(plan(3, 3), 6)
+        merger.add(0, questions(0, 6))
+        assert len(merger.questions) == 3
+        merger.add(1, None, "boom")
+        result, error = merger.finish("beginner")
+        assert error is None and len(result) == 6
+        assert top_up.calls == 0
+
+    def test_duplicates_are_dropped(self, top_up):
+        merger = generation.QuotaMerger(plan(3, 3), 6)
+        merger.add(0, questions(0, 3))
+        merger.add(1, questions(0, 3))
+        top_up.reply = (questions(10, 3), None)
+        result, error = merger.finish("beginner")
+        assert error is None
+        assert [q["mcq"] for q in result] == [f"Question {n}?" for n in (0, 1, 2, 10, 11, 12)]
+
+    def test_failed_sub_request_and_failed_top_up_is_an_error(self, top_up):
+        merger = generation.QuotaMerger(plan(5, 5, 5), 15)
+        merger.add(0, questions(0, 5))
+        merger.add(1, None, "batch failed")
+        merger.add(2, questions(5, 5))
+        result, error = merger.finish("beginner")
+        assert result is None
+        assert "10 of 15" in error and "batch failed" in error
+        assert top_up.calls == 1
+
+    def test_failed_sub_request_with_short_top_up_is_an_error(self, top_up):
+        merger = generation.QuotaMerger(plan(5, 5, 5), 15)
+        merger.add(0, questions(0, 5))
+        merger.add(1, None, "batch failed")
+        merger.add(2, questions(5, 5))
+        top_up.reply = (questions(20, 2), None)
+        result, error = merger.finish("beginner")
+        assert result is None and "12 of 15" in error
+
+    def test_partial_single_stream_is_topped_up(self, top_up):
+        merger = generation.QuotaMerger(plan(5), 5)
+        merger.add(0, questions(0, 2), "stream broke")
+        top_up.reply = (questions(10, 3), None)
+        result, error = merger.finish("beginner", top_up=False)
+        assert error is None and len(result) == 5
+        assert top_up.calls == 1
+
+    def test_partial_single_stream_that_stays_short_is_an_error(self, top_up):
+        merger = generation.QuotaMerger(plan(5), 5)
+        merger.add(0, questions(0, 2), "stream broke")
+        result, error = merger.finish("beginner", top_up=False)
+        assert result is None and "2 of 5" in error
+
+    def test_short_reply_without_errors_is_not_topped_up_when_disabled(self, top_up):
+        merger = generation.QuotaMerger(plan(5), 5)
+        merger.add(0, questions(0, 3))
+        result, error = merger.finish("beginner", top_up=False)
+        assert error is None and len(result) == 3
+        assert top_up.calls == 0
+
+    def test_nothing_at_all_is_an_error(self, top_up):
+        merger = generation.QuotaMerger(plan(5), 5)
+        merger.add(0, None, "no reply")
+        assert merger.finish("beginner") == (None, "no reply")
+
+    def test_on_question_sees_every_emitted_question_in_order(self, top_up):
+        seen = []
+        merger = generation.QuotaMerger(plan(2, 2), 4, on_question=lambda index, q: seen.append(index))
+        merger.add(0, questions(0, 3))
+        merger.add(1, questions(3, 1))
+        merger.finish("beginner")
+        assert seen == [0, 1, 2, 3]
+
+
+class TestFetchCaching:
+    def cached(self, text, num_questions):
+        key = generation.make_cache_key(text, "beginner", num_questions, generation.load_model().model_name,
+                                 generation.prompt_version_for(text))
+        return generation.get_question_cache().get(key, count=False)
+
+    def test_complete_quiz_is_cached(self, monkeypatch):
+        monkeypatch.setattr(generation, "generate_questions", lambda *args, **kwargs: (questions(0, 3), None))
+        text = "Complete quiz caching test text"
+        result, error = generation.fetch_questions_gemini(text, "beginner", 3)
+        assert error is None and len(result) == 3
+        assert self.cached(text, 3) == result
+
+    def test_short_quiz_is_served_but_not_cached(self, monkeypatch):
+        monkeypatch.setattr(generation, "generate_questions", lambda *args, **kwargs: (questions(0, 2), None))
+        text = "Short quiz caching test text"
+        result, error = generation.fetch_questions_gemini(text, "beginner", 5)
+        assert error is None and len(result) == 2
+        assert self.cached(text, 5) is None
+
+    def test_failed_stream_is_not_cached(self, monkeypatch):
+        def stream_questions(text, level, num_questions, on_question, variant=0):
+            for index, q in enumerate(questions(0, 2)):
+                on_question(index, q)
+            return None, "Only 2 of 5 questions could be generated"
+
+        monkeypatch.setattr(generation, "stream_questions", stream_questions)
+        monkeypatch.setattr(generation, "MULTI_LEVEL_ENABLED", False)
+        text = "Failed stream caching test text"
+        streamed = []
+        result, error = generation.fetch_questions_gemini(text, "beginner", 5, on_question=lambda i, q: streamed.append(i))
+        assert result is None and error
+        assert streamed == [0, 1]
+        assert self.cached(text, 5) is None
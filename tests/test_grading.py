@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+from grading import UNANSWERED, AnswerKey, grade_submissions, letter_grade, letter_grades
+
+
+def question(correct):
+    return {"mcq": "Q?", "options": {"a": "1", "b": "2", "c": "3", "d": "4"}, "correct": correct}
+
+
+@pytest.mark.parametrize("percentage, letter", [
+    (0, "F"), (59.99, "F"), (60, "C"), (69.9, "C"), (70, "B"), (80, "A"), (89.9, "A"), (90, "A+"), (100, "A+"),
+])
+def test_letter_grade_boundaries(percentage, letter):
+    assert letter_grade(percentage)[0] == letter
+
+
+def test_letter_grades_match_letter_grade():
+    percentages = np.array([0, 59.9, 60, 75, 85, 95, 100])
+    assert list(letter_grades(percentages)) == [letter_grade(p)[0] for p in percentages]
+
+
+def test_answer_key_resolves_letters_to_indices():
+    key = AnswerKey([question("a"), question("D"), question("z")])
+    assert list(key.correct) == [0, 3, UNANSWERED]
+    assert list(key.encode({0: 1, 2: None, 7: 2})) == [1, UNANSWERED, UNANSWERED]
+
+
+def test_grade_submissions_scores_a_class():
+    key = AnswerKey([question("a"), question("b"), question("c")])
+    report = grade_submissions(key, [[0, 1, 2], [0, 0, UNANSWERED], [3, 3, 3]])
+    assert list(report["scores"]) == [3, 1, 0]
+    assert report["percentages"][0] == pytest.approx(100.0)
+    assert list(report["grades"]) == ["A+", "F", "F"]
+    assert list(report["difficulty"]) == pytest.approx([2 / 3, 1 / 3, 1 / 3])
+    # Blank answers are not counted as picks
+    assert list(report["option_counts"][2]) == [0, 0, 1, 1]
+
+
+def test_single_submission_as_a_flat_row():
+    key = AnswerKey([question("a"), question("b")])
+    report = grade_submissions(key, [0, 0])
+    assert report["scores"].shape == (1,)
+    assert report["scores"][0] == 1
+
+
+def test_blank_answer_never_matches_an_unresolved_key():
+    key = AnswerKey([question("z")])
+    assert list(grade_submissions(key, [[UNANSWERED], [0]])["scores"]) == [0, 0]
+
+
+def test_discrimination_is_nan_when_everyone_answers_alike():
+    key = AnswerKey([question("a"), question("b"), question("c")])
+    report = grade_submissions(key, [[0, 1, 0], [0, 0, 2], [0, 1, 2]])
+    assert np.isnan(report["discrimination"][0])
+    assert not np.isnan(report["discrimination"][1])
+
+
+def test_wrong_number_of_answers_is_rejected():
+    with pytest.raises(ValueError):
+        grade_submissions(AnswerKey([question("a")]), [[0, 1]])
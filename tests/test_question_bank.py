@@ -0,0 +1,53 @@
+import pytest
+
+from question_bank import QuestionBank, content_hash
+
+
+def questions(count):
+    return [{"mcq": f"Question {n}?", "options": {"a": f"{n}a", "b": f"{n}b", "c": f"{n}c", "d": f"{n}d"},
+             "correct": "a"} for n in range(count)]
+
+
+@pytest.fixture
+def bank(tmp_path):
+    return QuestionBank(str(tmp_path / "bank.sqlite3"))
+
+
+def test_questions_are_stored_once(bank):
+    source = content_hash("Some document")
+    assert bank.add_questions(source, "Topic", "Beginner", "model", questions(5)) == 5
+    assert bank.add_questions(source, "Topic", "beginner", "model", questions(5)) == 0
+    assert bank.count(source, "beginner", "model") == 5
+
+
+def test_quiz_is_assembled_from_the_same_content(bank):
+    source = content_hash("Some document")
+    bank.add_questions(source, "Topic", "beginner", "model", questions(5))
+    assert len(bank.assemble_quiz(content_hash("Some  document"), "beginner", "model", 5)) == 5
+    assert bank.assemble_quiz(source, "beginner", "model", 6) is None
+    assert bank.assemble_quiz(source, "advanced", "model", 5) is None
+
+
+def test_topic_must_match_exactly(bank):
+    bank.add_questions(content_hash("doc"), "Hydrogen fuel cell vehicles", "beginner", "model", questions(5))
+    assert bank.assemble_quiz(content_hash("cell"), "beginner", "model", 5, topic="cell") is None
+    assert bank.assemble_quiz(content_hash("x"), "beginner", "model", 5, topic="fuel cell") is None
+    quiz = bank.assemble_quiz(content_hash("x"), "beginner", "model", 5, topic=" hydrogen  Fuel cell VEHICLES ")
+    assert len(quiz) == 5
+
+
+def test_derived_topics_are_not_reused_for_short_inputs(bank):
+    source = content_hash("Introduction\nMitochondria make ATP ...")
+    bank.add_questions(source, "Introduction", "beginner", "model", questions(3), derived_topic=True)
+    assert bank.assemble_quiz(content_hash("Introduction"), "beginner", "model", 3, topic="Introduction") is None
+    assert len(bank.assemble_quiz(source, "beginner", "model", 3)) == 3
+    assert bank.search("Introduction")
+
+
+def test_topic_quiz_draws_each_question_once(bank):
+    # "Python" and "python" are different content but the same topic
+    bank.add_questions(content_hash("Python"), "Python", "beginner", "model", questions(3))
+    bank.add_questions(content_hash("python"), "python", "beginner", "model", questions(3))
+    assert bank.assemble_quiz(content_hash("PYTHON"), "beginner", "model", 4, topic="PYTHON") is None
+    quiz = bank.assemble_quiz(content_hash("PYTHON"), "beginner", "model", 3, topic="PYTHON")
+    assert sorted(q["mcq"] for q in quiz) == ["Question 0?", "Question 1?", "Question 2?"]
@@ -0,0 +1,105 @@
+import pytest
+
+import question_cache
+from question_cache import QuestionCache, make_cache_key
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(question_cache, "time", clock)
+    return clock
+
+
+def test_cache_key_ignores_whitespace_and_separates_requests():
+    key = make_cache_key("Some  text\n", "beginner", 5, "model", "v1")
+    assert key == make_cache_key("Some text", "beginner", 5, "model", "v1")
+    assert key == make_cache_key("Some text", "beginner", 5, "model", "v1", variant=0)
+    assert key != make_cache_key("Some text", "beginner", 5, "model", "v1", variant=1)
+    assert key != make_cache_key("Some text", "advanced", 5, "model", "v1")
+    assert key != make_cache_key("Some text", "beginner", 10, "model", "v1")
+
+
+def test_get_counts_hits_and_misses():
+    cache = QuestionCache(None)
+    assert cache.get("k") is None
+    cache.set("k", [{"mcq": "Q?"}])
+    assert cache.get("k") == [{"mcq": "Q?"}]
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["hit_rate"]) == (1, 1, 0.5)
+
+
+def test_get_without_counting_leaves_stats_alone():
+    cache = QuestionCache(None)
+    cache.set("k", [1])
+    assert cache.get("k", count=False) == [1]
+    assert cache.get("missing", count=False) is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"]) == (0, 0)
+
+
+@pytest.mark.parametrize("on_disk", [False, True])
+def test_entries_expire_after_their_ttl(tmp_path, clock, on_disk):
+    cache = QuestionCache(str(tmp_path / "cache.sqlite3") if on_disk else None, ttl_seconds=60)
+    cache.set("k", [1])
+    cache.set("short", [2], ttl_seconds=10)
+    clock.now += 30
+    assert cache.get("k") == [1]
+    assert cache.get("short") is None
+    clock.now += 31
+    assert cache.get("k") is None
+    assert cache.stats()["expired"] >= 2
+
+
+def test_memory_tier_evicts_least_recently_used(clock):
+    cache = QuestionCache(None, max_memory_items=2)
+    cache.set("a", [1])
+    cache.set("b", [2])
+    cache.get("a")
+    cache.set("c", [3])
+    assert cache.get("b") is None
+    assert cache.get("a") == [1] and cache.get("c") == [3]
+    assert cache.stats()["memory_evictions"] == 1
+
+
+def test_memory_tier_respects_its_byte_budget():
+    cache = QuestionCache(None, max_memory_bytes=100)
+    cache.set("a", ["x" * 40])
+    cache.set("b", ["y" * 40])
+    cache.set("c", ["z" * 40])
+    assert cache.stats()["memory_bytes"] <= 100
+    assert cache.get("a") is None
+    # Values larger than the whole budget are not kept in memory at all
+    cache.set("huge", ["w" * 500])
+    assert cache.get("huge") is None
+
+
+def test_disk_tier_survives_a_new_instance(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    QuestionCache(path).set("k", [1])
+    cache = QuestionCache(path)
+    assert cache.get("k") == [1]
+    assert cache.stats()["disk_hits"] == 1
+
+
+def test_disk_tier_evicts_least_recently_used(tmp_path, clock):
+    path = str(tmp_path / "cache.sqlite3")
+    # No memory tier, so every get reads the disk
+    cache = QuestionCache(path, max_memory_items=0, max_disk_bytes=250)
+    for key in ("a", "b"):
+        cache.set(key, ["x" * 90])
+        clock.now += 1
+    cache.get("a")
+    clock.now += 1
+    cache.set("c", ["x" * 90])
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    assert cache.stats()["disk_evictions"] == 1
@@ -0,0 +1,149 @@
+import json
+
+import pytest
+
+from quiz_parsing import SCAN_DECODE_BUDGET, MCQStreamParser, extract_mcqs, validate_question
+
+
+def question(n, text=None):
+    return {
+        "mcq": text or f"Question {n}?",
+        "options": {"a": f"{n}-a", "b": f"{n}-b", "c": f"{n}-c", "d": f"{n}-d"},
+        "correct": "b",
+    }
+
+
+def reply(*questions, key="mcqs"):
+    return json.dumps({key: list(questions)})
+
+
+QUIZ = reply(question(1), question(2))
+
+
+class TestValidateQuestion:
+    def test_normalizes_a_valid_question(self):
+        valid = validate_question({**question(1), "mcq": "  Question 1?  ", "explanation": " because "})
+        assert valid["mcq"] == "Question 1?"
+        assert valid["explanation"] == "because"
+
+    def test_accepts_options_as_a_list(self):
+        valid = validate_question({"mcq": "Q?", "options": ["w", "x", "y", "z"], "correct": "c"})
+        assert valid["options"] == {"a": "w", "b": "x", "c": "y", "d": "z"}
+
+    @pytest.mark.parametrize("correct", ["B", "b) 1-b", "Answer: b", "1-b"])
+    def test_resolves_the_correct_answer(self, correct):
+        assert validate_question({**question(1), "correct": correct})["correct"] == "b"
+
+    @pytest.mark.parametrize("broken", [
+        {"options": {"a": "1", "b": "2", "c": "3"}},
+        {"options": {"a": "1", "b": "1", "c": "3", "d": "4"}},
+        {"mcq": "   "},
+        {"correct": "e"},
+        {"correct": None},
+    ])
+    def test_rejects_invalid_shapes(self, broken):
+        assert validate_question({**question(1), **broken}) is None
+
+
+class TestExtractMcqs:
+    def test_bare_json(self):
+        assert [q["mcq"] for q in extract_mcqs(QUIZ)] == ["Question 1?", "Question 2?"]
+
+    def test_fenced_json(self):
+        assert len(extract_mcqs(f"```json\n{QUIZ}\n```")) == 2
+
+    def test_prose_with_braces_around_the_quiz(self):
+        assert len(extract_mcqs(f"Here is {{your}} quiz: {QUIZ} Enjoy {{it}}!")) == 2
+
+    def test_invalid_questions_are_dropped(self):
+        broken = {"mcq": "Broken?", "options": {"a": "1"}, "correct": "a"}
+        assert [q["mcq"] for q in extract_mcqs(reply(broken, question(2)))] == ["Question 2?"]
+
+    def test_skips_objects_without_valid_questions(self):
+        text = f'{{"mcqs": []}} then {{"note": "mcqs"}} then {QUIZ}'
+        assert len(extract_mcqs(text)) == 2
+
+    def test_custom_key(self):
+        assert len(extract_mcqs(reply(question(1), key="beginner"), key="beginner")) == 1
+        assert extract_mcqs(reply(question(1), key="beginner")) is None
+
+    @pytest.mark.parametrize("text", ["", "no json here", '{"mcqs": [', "}{" * 100])
+    def test_no_quiz(self, text):
+        assert extract_mcqs(text) is None
+
+    @pytest.mark.parametrize("text", [
+        "{" * 20000 + '"mcqs"' + "}" * 20000,
+        '{"mcqs": 1, "x": ' * 5000 + "1" + "}" * 5000,
+    ])
+    def test_decoding_work_is_linear(self, monkeypatch, text):
+        decoded = []
+        loads = json.loads
+        monkeypatch.setattr(json, "loads", lambda s, *args, **kwargs: decoded.append(len(s)) or loads(s, *args, **kwargs))
+        assert extract_mcqs(text) is None
+        # The whole reply once, then at most SCAN_DECODE_BUDGET times its length in the scan
+        assert sum(decoded) <= (1 + SCAN_DECODE_BUDGET) * len(text)
+
+    def test_deep_nesting_does_not_raise(self):
+        deep = '{"mcqs": [], "b": ' * 2000 + "1" + "}" * 2000
+        assert extract_mcqs(deep) is None
+        assert len(extract_mcqs(f"{deep} and {QUIZ}")) == 2
+
+
+class TestMCQStreamParser:
+    def feed_in_chunks(self, text, size, key="mcqs"):
+        parser = MCQStreamParser(key)
+        questions = []
+        for start in range(0, len(text), size):
+            questions.extend(parser.feed(text[start:start + size]))
+        return parser, questions
+
+    @pytest.mark.parametrize("size", [1, 2, 3, 7, 64, 10000])
+    def test_chunk_boundaries_do_not_change_the_result(self, size):
+        text = "Sure! " + reply(question(1), question(2), question(3))
+        parser, questions = self.feed_in_chunks(text, size)
+        assert [q["mcq"] for q in questions] == ["Question 1?", "Question 2?", "Question 3?"]
+        assert parser.count == 3
+        assert parser.text == text
+
+    def test_scanned_text_is_not_kept_for_rescanning(self):
+        text = reply(*(question(n) for n in range(200)))
+        parser = MCQStreamParser()
+        longest = 0
+        for start in range(0, len(text), 64):
+            parser.feed(text[start:start + 64])
+            longest = max(longest, len(parser._window))
+        # Only the open question object is carried between chunks, never the whole reply
+        assert parser.count == 200
+        assert longest < 2 * len(json.dumps(question(199))) + 64
+        assert parser.text == text
+
+    def test_question_is_returned_when_its_object_closes(self):
+        text = reply(question(1), question(2))
+        first = json.dumps(question(1))
+        first_end = text.index(first) + len(first)
+        parser = MCQStreamParser()
+        assert parser.feed(text[:first_end - 1]) == []
+        assert [q["mcq"] for q in parser.feed(text[first_end - 1:first_end])] == ["Question 1?"]
+        assert [q["mcq"] for q in parser.feed(text[first_end:])] == ["Question 2?"]
+
+    @pytest.mark.parametrize("size", [1, 2, 5])
+    def test_escaped_quotes_and_braces_inside_strings(self, size):
+        tricky = question(1, text='He said "}{" and \\"quoted\\" {braces] \\\\')
+        _, questions = self.feed_in_chunks(reply(tricky, question(2)), size)
+        assert questions[0]["mcq"] == tricky["mcq"]
+        assert len(questions) == 2
+
+    def test_only_the_keyed_array_is_parsed(self):
+        text = json.dumps({"other": [question(9)], "mcqs": [question(1)], "after": [question(8)]})
+        _, questions = self.feed_in_chunks(text, 4)
+        assert [q["mcq"] for q in questions] == ["Question 1?"]
+
+    def test_custom_key(self):
+        text = json.dumps({"beginner": [question(1)], "advanced": [question(2)]})
+        _, questions = self.feed_in_chunks(text, 3, key="advanced")
+        assert [q["mcq"] for q in questions] == ["Question 2?"]
+
+    def test_deeply_nested_question_is_skipped_without_raising(self):
+        text = '{"mcqs": [' + json.dumps(question(1)) + ", " + '{"x": ' * 2000 + "1" + "}" * 2000 + "]}"
+        _, questions = self.feed_in_chunks(text, 512)
+        assert [q["mcq"] for q in questions] == ["Question 1?"]
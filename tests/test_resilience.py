@@ -0,0 +1,42 @@
+import time
+
+import pytest
+
+from resilience import CallTimeout, ResiliencePolicy
+
+
+def trickle(chunks=None, gap=0.02):
+    def open_stream():
+        count = 0
+        while chunks is None or count < chunks:
+            time.sleep(gap)
+            count += 1
+            yield count
+    return open_stream
+
+
+def test_stream_yields_every_chunk():
+    policy = ResiliencePolicy(timeout=1, stream_timeout=5)
+    assert list(policy.stream(trickle(5))) == [1, 2, 3, 4, 5]
+
+
+def test_trickling_stream_is_abandoned_at_the_stream_deadline():
+    policy = ResiliencePolicy(timeout=1, stream_timeout=0.3, backoff_base=0)
+    started = time.monotonic()
+    received = []
+    with pytest.raises(CallTimeout, match="not finished"):
+        for chunk in policy.stream(trickle()):
+            received.append(chunk)
+    assert received and time.monotonic() - started < 1
+    assert policy.stats()["timeouts"] == 1
+
+
+def test_silent_stream_times_out_between_chunks():
+    policy = ResiliencePolicy(timeout=0.1, stream_timeout=5, max_attempts=1)
+    with pytest.raises(CallTimeout, match="No streamed reply"):
+        list(policy.stream(trickle(gap=1)))
+
+
+def test_hedging_follows_the_percentile():
+    assert not ResiliencePolicy().hedging
+    assert ResiliencePolicy(hedge_percentile=0.95).hedging
@@ -0,0 +1,64 @@
+import threading
+import time
+
+from singleflight import SingleFlight
+
+
+def test_concurrent_callers_share_one_call():
+    flight = SingleFlight()
+    calls = []
+    started = threading.Event()
+
+    def work(publish):
+        calls.append(1)
+        started.set()
+        time.sleep(0.2)
+        publish("partial")
+        return "done"
+
+    results, items = [], []
+    leader = threading.Thread(target=lambda: results.append(flight.do("k", work)))
+    leader.start()
+    started.wait()
+    results.append(flight.do("k", work, on_item=items.append))
+    leader.join()
+    assert results == ["done", "done"]
+    assert items == ["partial"]
+    assert len(calls) == 1
+
+
+def test_lease_is_renewed_while_the_leader_works(tmp_path):
+    path = str(tmp_path / "leases.sqlite3")
+    first = SingleFlight(path, lease_seconds=0.3, poll_interval=0.05)
+    second = SingleFlight(path, lease_seconds=0.3, poll_interval=0.05)
+    published = []
+    calls = []
+
+    def work(publish):
+        calls.append(1)
+        # Several lease lengths: without renewal the second process would take over
+        time.sleep(1.2)
+        published.append("done")
+        return "done"
+
+    def lookup():
+        return published[0] if published else None
+
+    leader = threading.Thread(target=lambda: first.do("k", work, lookup=lookup))
+    leader.start()
+    time.sleep(0.1)
+    assert second.do("k", work, lookup=lookup) == "done"
+    leader.join()
+    assert len(calls) == 1
+    assert second.stats()["takeovers"] == 0
+    assert second.stats()["remote_hits"] == 1
+
+
+def test_expired_lease_is_taken_over(tmp_path):
+    path = str(tmp_path / "leases.sqlite3")
+    crashed = SingleFlight(path, lease_seconds=0.2)
+    # A process that took the lease and died never renews or releases it
+    assert crashed._acquire("k")
+    survivor = SingleFlight(path, lease_seconds=0.2, poll_interval=0.05)
+    assert survivor.do("k", lambda publish: "mine", lookup=lambda: None) == "mine"
+    assert survivor.stats()["takeovers"] == 1